@@ -0,0 +1,104 @@
+"""
+Compare selective viewPayload extraction (zara.payload) with a full json.loads.
+
+    python bench/payload_bench.py                  # synthetic payload
+    python bench/payload_bench.py --file page.json # a captured viewPayload (JSON text only)
+
+Reports time per decode and peak transient memory (tracemalloc) for each approach.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zara.payload import extract_product  # noqa: E402
+
+
+def synthetic_payload(scale: int = 1) -> str:
+    """A payload shaped like Zara's: big SEO/navigation/media blocks around a small product core."""
+    rng = random.Random(42)
+
+    def media(n):
+        return [{"path": f"/photos/{i}/w/{rng.randint(100, 999)}.jpg", "width": 1920, "height": 2880,
+                 "extraInfo": {"deliveryUrl": "https://static.zara.net/assets/public/" + "x" * 60,
+                               "originalName": f"image_{i}", "tags": ["a", "b", "c"]}} for i in range(n)]
+
+    def category(depth, width):
+        node = {"id": rng.randint(1, 10 ** 6), "name": 'Category "quoted" {x} [y]', "seo": {"keyword": "k" * 30}}
+        if depth:
+            node["subcategories"] = [category(depth - 1, width) for _ in range(width)]
+        return node
+
+    payload = {
+        "seo": {"metaTags": [{"name": f"tag{i}", "content": "c" * 120} for i in range(200 * scale)]},
+        "navigation": [category(3, 6) for _ in range(4 * scale)],
+        "product": {
+            "id": 452744597,
+            "name": "HEAVYWEIGHT REGULAR FIT BASIC T-SHIRT",
+            "detail": {
+                "description": "d" * 2000,
+                "colors": [
+                    {
+                        "id": "800",
+                        "xmedia": media(40 * scale),
+                        "productId": 452744597,
+                        "sizes": [{"sku": 452744598 + i, "name": n, "availability": "in_stock"}
+                                  for i, n in enumerate(["S", "M", "L", "XL", "XXL"])],
+                    },
+                    {"id": "250", "xmedia": media(40 * scale), "productId": 452744600, "sizes": []},
+                ],
+            },
+            "relatedProducts": [{"id": i, "xmedia": media(3)} for i in range(60 * scale)],
+        },
+        "analytics": {"events": [{"k": i, "v": "v" * 40} for i in range(500 * scale)]},
+    }
+    return json.dumps(payload)
+
+
+def full_decode(text: str):
+    data = json.loads(text)
+    color = data['product']['detail']['colors'][0]
+    return {'name': data['product']['name'], 'productId': color['productId'], 'sizes': color['sizes']}
+
+
+def measure(fn, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', help='file containing the viewPayload JSON')
+    parser.add_argument('--scale', type=int, default=1, help='size multiplier for the synthetic payload')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    text = open(args.file, encoding='utf-8').read() if args.file else synthetic_payload(args.scale)
+    assert extract_product(text) == full_decode(text)
+
+    print(f'payload: {len(text) / 1024:.0f} KiB')
+    results = {}
+    for label, fn in (('json.loads (full)', full_decode), ('zara.payload (selective)', extract_product)):
+        results[label] = measure(fn, text, args.repeat)
+        seconds, peak = results[label]
+        print(f'{label:26} {seconds * 1000:8.2f} ms   peak {peak / 1024:8.0f} KiB')
+    (full_t, full_m), (sel_t, sel_m) = results.values()
+    print(f'speedup {full_t / sel_t:.1f}x, peak memory {full_m / max(sel_m, 1):.0f}x lower')
+
+
+if __name__ == '__main__':
+    main()
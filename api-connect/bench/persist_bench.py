@@ -0,0 +1,207 @@
+"""
+Throughput and latency of Persist against a real Postgres.
+
+    python bench/persist_bench.py                          # throwaway cluster (needs initdb/pg_ctl on PATH)
+    python bench/persist_bench.py --database-url postgresql://...   # an existing, disposable database
+    python bench/persist_bench.py --users 10000 --products 50000 --subs-per-user 20 --concurrency 32
+
+Seeds users, products and subscriptions at the chosen scale, then runs each operation
+from --concurrency threads and reports ops/s and p50/p95/p99 latency. Seeded rows use
+a "bench-" prefix and are replaced on every run; do not point this at production.
+"""
+import argparse
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persist import Persist  # noqa: E402
+
+BENCH_USER = 'bench-user-'
+BENCH_PRODUCT_BASE = 900000000
+SIZES = {1: 'S', 2: 'M', 3: 'L', 4: 'XL'}
+
+
+def bench_url(n: int) -> str:
+    return f'https://www.zara.com/nl/en/bench-p{n}.html?v1={BENCH_PRODUCT_BASE + n}'
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def throwaway_postgres(max_connections: int):
+    """initdb a cluster in a temp dir, start it on a free port, and remove it afterwards."""
+    bindir = None
+    if not shutil.which('initdb') and shutil.which('pg_config'):
+        bindir = subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True).stdout.strip()
+    initdb = shutil.which('initdb', path=bindir)
+    pg_ctl = shutil.which('pg_ctl', path=bindir)
+    if not initdb or not pg_ctl:
+        sys.exit('initdb/pg_ctl not found; install Postgres or pass --database-url')
+
+    datadir = tempfile.mkdtemp(prefix='shppd-bench-')
+    port = _free_port()
+    try:
+        subprocess.run([initdb, '-D', datadir, '-U', 'postgres', '-A', 'trust'], check=True, stdout=subprocess.DEVNULL)
+        options = f"-p {port} -k {datadir} -c listen_addresses=127.0.0.1 -c max_connections={max_connections} -c fsync=off"
+        subprocess.run([pg_ctl, '-D', datadir, '-o', options, '-l', os.path.join(datadir, 'log'), '-w', 'start'],
+                       check=True, stdout=subprocess.DEVNULL)
+        try:
+            yield f'postgresql://postgres@127.0.0.1:{port}/postgres'
+        finally:
+            subprocess.run([pg_ctl, '-D', datadir, '-m', 'immediate', 'stop'], stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+
+
+def seed(persist: Persist, users: int, products: int, subs_per_user: int):
+    """Replace the bench rows with users x subs_per_user subscriptions spread over products."""
+    conn = persist._get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM users WHERE chat_id LIKE %s;", (BENCH_USER + '%',))
+            cur.execute("DELETE FROM products WHERE url LIKE %s;", ('%/bench-p%',))
+            cur.execute(
+                """
+                INSERT INTO users (chat_id)
+                SELECT %s || g FROM generate_series(1, %s) g;
+                """,
+                (BENCH_USER, users),
+            )
+            cur.execute(
+                """
+                INSERT INTO products (product_id, name, url, v1, sizes, refreshed_at)
+                SELECT (%s + g)::text, 'Bench product ' || g,
+                       'https://www.zara.com/nl/en/bench-p' || g || '.html?v1=' || (%s + g),
+                       (%s + g)::text, '{"1": "S", "2": "M", "3": "L", "4": "XL"}'::jsonb, NOW()
+                FROM generate_series(1, %s) g;
+                """,
+                (BENCH_PRODUCT_BASE, BENCH_PRODUCT_BASE, BENCH_PRODUCT_BASE, products),
+            )
+            # Deterministic spread: user u follows products (u * 7919 + k * 104729) mod N.
+            cur.execute(
+                """
+                INSERT INTO subscriptions (chat_id, product_id, selected_sizes)
+                SELECT %s || u, p.id, ARRAY['M']
+                FROM generate_series(1, %s) u
+                CROSS JOIN generate_series(1, %s) k
+                JOIN products p ON p.product_id = (%s + 1 + (u * 7919 + k * 104729) %% %s)::text
+                ON CONFLICT DO NOTHING;
+                """,
+                (BENCH_USER, users, subs_per_user, BENCH_PRODUCT_BASE, products),
+            )
+            cur.execute(
+                """
+                SELECT s.chat_id, p.url FROM subscriptions s
+                JOIN products p ON s.product_id = p.id
+                WHERE s.chat_id LIKE %s;
+                """,
+                (BENCH_USER + '%',),
+            )
+            pairs = cur.fetchall()
+            cur.execute("ANALYZE users; ANALYZE products; ANALYZE subscriptions;")
+        conn.commit()
+    finally:
+        conn.close()
+    return pairs
+
+
+def percentile(sorted_values, pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run(label: str, fn, ops: int, concurrency: int):
+    """Call fn(i) for i in range(ops) from `concurrency` threads; print ops/s and percentiles."""
+    latencies = []
+    errors = []
+    counter = iter(range(ops))
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            started = time.perf_counter()
+            try:
+                fn(i)
+            except Exception as exc:  # keep going; report at the end
+                errors.append(exc)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+    print(f'{label:26} {ops / elapsed:9.0f} ops/s   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   p99 {p99:7.2f} ms'
+          + (f'   errors {len(errors)} ({errors[0]!r})' if errors else ''))
+
+
+def benchmark(database_url: str, args):
+    persist = Persist(database_url)
+    persist.migrate()
+
+    started = time.perf_counter()
+    pairs = seed(persist, args.users, args.products, args.subs_per_user)
+    print(f'seeded {args.users} users, {args.products} products, {len(pairs)} subscriptions '
+          f'in {time.perf_counter() - started:.1f}s; concurrency {args.concurrency}')
+
+    rng = random.Random(42)
+    rng.shuffle(pairs)
+    chats = [f'{BENCH_USER}{u}' for u in range(1, args.users + 1)]
+
+    def add_subscription(i):
+        n = rng.randint(1, args.products)
+        product = SimpleNamespace(productId=str(BENCH_PRODUCT_BASE + n), name=f'Bench product {n}',
+                                  url=bench_url(n), v1=str(BENCH_PRODUCT_BASE + n), sizes=SIZES)
+        persist.add_subscription(rng.choice(chats), product, selected_sizes=['M', 'L'])
+
+    # Reads first, then writes; removals consume distinct seeded subscriptions.
+    run('get_selected_sizes', lambda i: persist.get_selected_sizes(*pairs[i % len(pairs)]), args.ops, args.concurrency)
+    run('get_products_by_chat_id', lambda i: persist.get_products_by_chat_id(chats[i % len(chats)]), args.ops, args.concurrency)
+    run('add_subscription', add_subscription, args.ops, args.concurrency)
+    run('remove_product', lambda i: persist.remove_product(*pairs[i]), min(args.ops, len(pairs)), args.concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='disposable database to use instead of a throwaway cluster')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--subs-per-user', type=int, default=10)
+    parser.add_argument('--ops', type=int, default=2000, help='calls per operation')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent callers (threads)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        benchmark(args.database_url, args)
+    else:
+        with throwaway_postgres(max_connections=args.concurrency * 2 + 10) as database_url:
+            benchmark(database_url, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import heapq
+import itertools
+from collections import Counter, deque
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class FairQueue:
+    """
+    Weighted fair queue of polls, keyed by the chats that own them.
+
+    Each chat is a flow with its own FIFO of pending items and a virtual time
+    measuring the service it has received, normalised by its weight. pop()
+    serves the backlogged chat with the lowest virtual time. An item owned by
+    several chats (a product followed by more than one chat) is queued in every
+    owner's flow, dispatched once, and its cost is split evenly between them.
+
+    A chat may also be capped at `quota` items in flight; while other chats
+    are waiting it is skipped until one of its polls finishes (see done()).
+    The cap only shares out scarce capacity: when every backlogged chat is at
+    its quota, the one with the lowest virtual time is served anyway rather
+    than leaving workers idle.
+    """
+
+    def __init__(self, quota: Optional[int] = None):
+        self.quota = quota
+        self._flows: Dict[Hashable, deque] = {}
+        self._vtime: Dict[Hashable, float] = {}
+        self._in_flight: Counter = Counter()
+        self._items: Dict[Hashable, Tuple[Any, Dict[Hashable, float]]] = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual_clock = 0.0  # virtual time of the last dispatch
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def push(self, key: Hashable, item: Any, owners: Dict[Hashable, float]):
+        """Queue `item` under `key` for the given {chat: weight} owners."""
+        if key in self._items or not owners:
+            return
+        self._items[key] = (item, dict(owners))
+        for chat in owners:
+            flow = self._flows.get(chat)
+            if flow is None:
+                flow = self._flows[chat] = deque()
+            if not flow:
+                # A chat that was idle does not get to bank credit while away.
+                self._vtime[chat] = max(self._vtime.get(chat, 0.0), self._virtual_clock)
+                self._activate(chat)
+            flow.append(key)
+
+    def pop(self) -> Optional[Tuple[Hashable, Any, Dict[Hashable, float]]]:
+        """Next (key, item, owners) to dispatch, or None if nothing is eligible."""
+        parked = []
+        try:
+            while self._heap:
+                vtime, _seq, chat = heapq.heappop(self._heap)
+                flow = self._flows.get(chat)
+                if vtime != self._vtime.get(chat) or not flow:
+                    continue  # stale heap entry
+                while flow and flow[0] not in self._items:
+                    flow.popleft()  # already dispatched through another owner
+                if not flow:
+                    continue
+                if self.quota is not None and self._in_flight[chat] >= self.quota:
+                    parked.append((vtime, chat))
+                    continue
+                return self._serve(chat, vtime)
+            if parked:
+                # Nobody under quota is waiting; parked chats came off the heap
+                # in virtual-time order, so the first is the most deserving.
+                vtime, chat = parked.pop(0)
+                return self._serve(chat, vtime)
+            return None
+        finally:
+            for _vtime, chat in parked:
+                self._activate(chat)
+
+    def _serve(self, chat: Hashable, vtime: float) -> Tuple[Hashable, Any, Dict[Hashable, float]]:
+        key = self._flows[chat].popleft()
+        item, owners = self._items.pop(key)
+        self._virtual_clock = vtime
+        self._charge(owners)
+        return key, item, owners
+
+    def done(self, owners: Dict[Hashable, float]):
+        """Mark a dispatched item's poll as finished, freeing its owners' quota."""
+        for chat in owners:
+            self._in_flight[chat] -= 1
+            if self._in_flight[chat] <= 0:
+                del self._in_flight[chat]
+
+    def discard(self, key: Hashable):
+        """Drop a queued item (its flows skip it lazily)."""
+        self._items.pop(key, None)
+
+    def backlog(self) -> Dict[Hashable, int]:
+        """Queued item count per chat, for stats."""
+        return {chat: sum(1 for key in flow if key in self._items) for chat, flow in self._flows.items() if flow}
+
+    def _charge(self, owners: Dict[Hashable, float]):
+        share = 1.0 / len(owners)
+        for chat, weight in owners.items():
+            self._in_flight[chat] += 1
+            self._vtime[chat] = self._vtime.get(chat, self._virtual_clock) + share / weight
+            if self._flows.get(chat):
+                self._activate(chat)
+            else:
+                self._flows.pop(chat, None)
+
+    def _activate(self, chat: Hashable):
+        heapq.heappush(self._heap, (self._vtime[chat], next(self._seq), chat))
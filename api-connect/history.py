@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from persist import Persist
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityHistory:
+    """
+    Append-only record of per-SKU stock transitions.
+
+    record() is called from the polling path and only touches memory: it keeps
+    the last seen state per (product, SKU) and buffers a row when it changes.
+    A background thread flushes the buffer to Postgres with one COPY per batch,
+    so the tracker never waits on the database.
+    """
+
+    def __init__(
+        self,
+        persist: Persist,
+        flush_interval: Optional[float] = None,
+        flush_size: Optional[int] = None,
+        max_buffer: Optional[int] = None,
+        retention_days: Optional[int] = None,
+    ):
+        self.persist = persist
+        self.flush_interval = flush_interval or float(os.getenv('HISTORY_FLUSH_INTERVAL_SECONDS', 5))
+        self.flush_size = flush_size or int(os.getenv('HISTORY_FLUSH_SIZE', 5000))
+        # Hard cap so a database outage cannot grow memory without bound.
+        self.max_buffer = max_buffer or int(os.getenv('HISTORY_MAX_BUFFER', 200000))
+        self.retention_days = retention_days or int(os.getenv('HISTORY_RETENTION_DAYS', 90))
+
+        self._last_state: Dict[Tuple[str, int], bool] = {}
+        self._buffer: List[Tuple[datetime, str, int, bool]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._known_partitions = set()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='availability-history', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def record(self, product_id, stock: List[Tuple[int, bool]], observed_at: Optional[datetime] = None):
+        observed_at = observed_at or datetime.now(timezone.utc)
+        product_id = str(product_id)
+        with self._lock:
+            for sku, in_stock in stock:
+                key = (product_id, sku)
+                if self._last_state.get(key) == in_stock:
+                    continue
+                self._last_state[key] = in_stock
+                if len(self._buffer) >= self.max_buffer:
+                    self.dropped += 1
+                    continue
+                self._buffer.append((observed_at, product_id, sku, in_stock))
+            pending = len(self._buffer)
+        if pending >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write all buffered rows; on failure they are put back for the next attempt."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        try:
+            days = {row[0].astimezone(timezone.utc).date() for row in rows}
+            missing = days - self._known_partitions
+            if missing:
+                self.persist.ensure_history_partitions(missing)
+                self._known_partitions |= missing
+            self.persist.copy_availability(rows)
+        except Exception:
+            logger.exception('Failed to flush %s availability history rows', len(rows))
+            with self._lock:
+                room = self.max_buffer - len(self._buffer)
+                self.dropped += max(0, len(rows) - room)
+                self._buffer = rows[:room] + self._buffer
+            return 0
+        return len(rows)
+
+    def compact(self) -> List[str]:
+        """Drop daily partitions older than the retention window."""
+        cutoff = datetime.now(timezone.utc).date() - timedelta(days=self.retention_days)
+        dropped = self.persist.drop_history_before(cutoff)
+        self._known_partitions = {day for day in self._known_partitions if day >= cutoff}
+        return dropped
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
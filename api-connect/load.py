@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Names accepted by POST /follow.
+PRIORITIES = {'high': PRIORITY_HIGH, 'normal': PRIORITY_NORMAL, 'low': PRIORITY_LOW}
+
+# Degradation level at which each priority starts having its interval stretched.
+# High priority products are never stretched.
+_STRETCH_FROM_LEVEL = {PRIORITY_LOW: 1, PRIORITY_NORMAL: 2}
+
+
+class LoadMonitor:
+    """
+    Tracks how late polls start compared to when they were planned and turns
+    sustained lag into a degradation level (0 = healthy).
+
+    The level moves one step at a time, at most once per `evaluate_every`
+    seconds, with hysteresis: it rises while the smoothed lag is above
+    `lag_threshold` and falls once it drops below half of it. Callers use
+    stretch() to lengthen polling intervals of lower-priority products.
+    """
+
+    def __init__(
+        self,
+        lag_threshold: float = 2.0,
+        max_level: int = 3,
+        evaluate_every: float = 10.0,
+        smoothing: float = 0.1,
+        clock=time.monotonic,
+    ):
+        self.lag_threshold = lag_threshold
+        self.max_level = max_level
+        self.evaluate_every = evaluate_every
+        self.smoothing = smoothing
+        self.clock = clock
+        self.level = 0
+        self.lag_ewma = 0.0
+        self.counters: Counter = Counter()
+        self._recent_lags = deque(maxlen=1024)
+        self._last_evaluated = clock()
+        self._lock = threading.Lock()
+
+    def observe(self, lag: float, duration: Optional[float] = None, interval: Optional[float] = None) -> bool:
+        """
+        Record one poll's start lag (and optionally its run time). Returns True
+        when the degradation level changed, so the caller can reschedule.
+        """
+        lag = max(0.0, lag)
+        with self._lock:
+            self.counters['polls'] += 1
+            if duration is not None and interval is not None and duration > interval:
+                self.counters['overruns'] += 1
+            self._recent_lags.append(lag)
+            self.lag_ewma += self.smoothing * (lag - self.lag_ewma)
+            return self._evaluate()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _evaluate(self) -> bool:
+        now = self.clock()
+        if now - self._last_evaluated < self.evaluate_every:
+            return False
+        self._last_evaluated = now
+
+        previous = self.level
+        if self.lag_ewma > self.lag_threshold and self.level < self.max_level:
+            self.level += 1
+        elif self.lag_ewma < self.lag_threshold / 2 and self.level > 0:
+            self.level -= 1
+        if self.level == previous:
+            return False
+
+        log = logger.warning if self.level > previous else logger.info
+        log('Tracker load level %s -> %s (lag ewma %.2fs, threshold %.2fs)',
+            previous, self.level, self.lag_ewma, self.lag_threshold)
+        self.counters['level_changes'] += 1
+        return True
+
+    def stretch(self, priority: int) -> int:
+        """Interval multiplier for a product of the given priority at the current level."""
+        start = _STRETCH_FROM_LEVEL.get(priority)
+        if start is None or self.level < start:
+            return 1
+        return 2 ** (self.level - start + 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lags = sorted(self._recent_lags)
+            counters = dict(self.counters)
+        p95 = lags[min(len(lags) - 1, int(0.95 * len(lags)))] if lags else None
+        return {
+            'level': self.level,
+            'lag_ewma': round(self.lag_ewma, 3),
+            'lag_p95': p95,
+            'stretch': {
+                'high': self.stretch(PRIORITY_HIGH),
+                'normal': self.stretch(PRIORITY_NORMAL),
+                'low': self.stretch(PRIORITY_LOW),
+            },
+            'counters': counters,
+        }
@@ -0,0 +1,153 @@
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ordered, append-only list of (version, description, statements).
+# Never edit a migration that has shipped; add a new version instead.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (
+        1,
+        "users, products, subscriptions",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                chat_id TEXT PRIMARY KEY,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                id SERIAL PRIMARY KEY,
+                product_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                url TEXT NOT NULL,
+                v1 TEXT NOT NULL,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                UNIQUE(product_id, name, v1)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                chat_id TEXT NOT NULL REFERENCES users(chat_id) ON DELETE CASCADE,
+                product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+                selected_sizes TEXT[],
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                UNIQUE(chat_id, product_id)
+            );
+            """,
+            # Databases created before size selection existed lack this column.
+            "ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS selected_sizes TEXT[];",
+        ],
+    ),
+    (
+        2,
+        "stored product metadata for URL resolution",
+        [
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS sizes JSONB;",
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMPTZ DEFAULT NOW();",
+            "CREATE INDEX IF NOT EXISTS products_url_idx ON products (url);",
+        ],
+    ),
+    (
+        3,
+        "append-only availability history, partitioned by day",
+        [
+            # Daily partitions are created on demand by Persist.ensure_history_partitions
+            # and dropped by Persist.drop_history_before once past retention.
+            """
+            CREATE TABLE IF NOT EXISTS availability_history (
+                observed_at TIMESTAMPTZ NOT NULL,
+                product_id TEXT NOT NULL,
+                sku BIGINT NOT NULL,
+                in_stock BOOLEAN NOT NULL
+            ) PARTITION BY RANGE (observed_at);
+            """,
+            "CREATE INDEX IF NOT EXISTS availability_history_product_idx ON availability_history (product_id, observed_at);",
+        ],
+    ),
+    (
+        4,
+        "queue of subscription changes for a separate tracker worker",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS tracker_events (
+                id BIGSERIAL PRIMARY KEY,
+                kind TEXT NOT NULL CHECK (kind IN ('subscribe', 'unsubscribe')),
+                chat_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                selected_sizes TEXT[],
+                priority INTEGER,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            """,
+        ],
+    ),
+    (
+        5,
+        "tracker fetch outcome per product",
+        [
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMPTZ;",
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS error_count INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS last_error_at TIMESTAMPTZ;",
+        ],
+    ),
+    (
+        6,
+        "per-subscription polling priority",
+        [
+            # 1 is load.PRIORITY_NORMAL.
+            "ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 1;",
+        ],
+    ),
+]
+
+# Arbitrary constant so concurrent deploys serialise on the same advisory lock.
+_LOCK_ID = 5508
+
+
+def migrate(conn) -> List[int]:
+    """
+    Apply pending migrations on an open psycopg2 connection.
+    Each version runs in its own transaction and is recorded in schema_migrations.
+    Returns the list of versions applied by this call.
+    """
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            """
+        )
+    conn.commit()
+
+    for version, name, statements in MIGRATIONS:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_ID,))
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s;", (version,))
+            if cur.fetchone() is not None:
+                conn.commit()
+                continue
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                (version, name),
+            )
+        conn.commit()
+        applied.append(version)
+        logger.info("Applied migration %s: %s", version, name)
+
+    return applied
+
+
+if __name__ == '__main__':
+    from persist import Persist
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    versions = Persist().migrate()
+    logger.info("Schema up to date (applied %s)", versions or "nothing")
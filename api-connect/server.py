@@ -1,18 +1,64 @@
-from flask import Flask, request
+from flask import Blueprint, Flask, current_app, request
 from zara.util import parse_zara_url, map_sizes_to_bools
-from zara.api import get_product, get_stock
 from persist import Persist
-from tracker import Tracker
+from load import PRIORITIES, PRIORITY_NORMAL
 import logging
+import os
+import threading
 
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 
-persist = Persist()
-tracker = Tracker(persist)
-app = Flask(__name__)
+# 'embedded' runs the tracker inside this process (single web worker only);
+# 'external' only queues subscription changes for worker.py to apply.
+TRACKER_MODE = os.getenv('TRACKER_MODE', 'embedded')
 
-@app.get('/zara/item')
+# How long a stored product record may be reused by /follow before going upstream again.
+PRODUCT_MAX_AGE_SECONDS = int(os.getenv('PRODUCT_MAX_AGE_SECONDS', 6 * 60 * 60))
+
+# Nothing heavy happens at import time: the database, the tracker's scheduler and the
+# scraping stack (requests) are all set up on first use by a request.
+# Schema changes are applied separately with `python migrations.py`.
+bp = Blueprint('api', __name__)
+_init_lock = threading.Lock()
+
+
+def create_app(persist=None, tracker=None) -> Flask:
+    """
+    Build the Flask app. persist/tracker may be injected (tests); otherwise they are
+    created lazily the first time a request needs them.
+    """
+    app = Flask(__name__)
+    app.extensions['shppd'] = {'persist': persist, 'tracker': tracker}
+    app.register_blueprint(bp)
+    return app
+
+
+def get_persist() -> Persist:
+    state = current_app.extensions['shppd']
+    if state['persist'] is None:
+        with _init_lock:
+            if state['persist'] is None:
+                state['persist'] = Persist()
+    return state['persist']
+
+
+def get_tracker():
+    state = current_app.extensions['shppd']
+    if state['tracker'] is None:
+        with _init_lock:
+            if state['tracker'] is None and TRACKER_MODE == 'external':
+                from tracker_queue import QueuedTracker
+                state['tracker'] = QueuedTracker(get_persist())
+            elif state['tracker'] is None:
+                from tracker import Tracker
+                state['tracker'] = Tracker(get_persist())
+    return state['tracker']
+
+
+@bp.get('/zara/item')
 def get_zara_item_data():
+    from zara.api import get_product, get_stock
+
     url = request.args.get('url')
 
     # Validate that 'url' parameter is present
@@ -30,30 +76,45 @@ def get_zara_item_data():
         "v1": product.v1
     }
 
-@app.get('/follow/<chat_id>')
+@bp.get('/follow/<chat_id>')
 def get_followed_items(chat_id):
+    persist = get_persist()
     if not persist.user_exist(chat_id):
         return f'Chat ID {chat_id} is not saved in DB'
     return persist.get_products_by_chat_id(chat_id)
 
-@app.post('/follow/<chat_id>')
+@bp.post('/follow/<chat_id>')
 def follow_item(chat_id):
+    from zara.api import get_product
+
+    persist = get_persist()
     url = request.json['url']
     selected_sizes = request.json.get('sizes')
+    priority_name = request.json.get('priority')
     logging.info(f'Adding url: {url}')
 
     if not url:
         return 'URL parameter is missing', 400
+    if priority_name is not None and (not isinstance(priority_name, str) or priority_name not in PRIORITIES):
+        return f"priority must be one of {', '.join(PRIORITIES)}", 400
+    # None leaves an existing subscription's priority as it is.
+    priority = None if priority_name is None else PRIORITIES[priority_name]
     
     parsed = parse_zara_url(url)
     url = f"https://www.zara.com/nl/en/{parsed['product']}.html?v1={parsed['v1']}"
 
     try:
-        product = get_product(parsed['product'], parsed['v1'])
+        # Products already followed by another chat resolve from the DB without scraping.
+        product = persist.get_product_by_url(url, PRODUCT_MAX_AGE_SECONDS)
+        cached = product is not None
+        if not cached:
+            product = get_product(parsed['product'], parsed['v1'])
         size_names = list(dict.fromkeys(product.sizes.values()))
         requires_selection = len(size_names) > 1 and not selected_sizes
 
-        created, updated_sizes = persist.add_subscription(chat_id, product, selected_sizes=selected_sizes)
+        created, updated_sizes = persist.add_subscription(
+            chat_id, product, selected_sizes=selected_sizes, refresh=not cached, priority=priority
+        )
 
         if requires_selection:
             logging.info("Chat %s needs to pick sizes for %s", chat_id, product.productId)
@@ -77,13 +138,33 @@ def follow_item(chat_id):
             logging.info("Chat %s already follows product %s with same sizes", chat_id, product.productId)
             return 'Already subscribed', 200
 
+        if priority is None:
+            stored = None if created else persist.get_subscription_priority(chat_id, product.url)
+            priority = PRIORITY_NORMAL if stored is None else stored
         logging.info(f'Subscribing to {url} for sizes {sizes_to_track}')
-        tracker.subscribe(chat_id, product.url, sizes_to_track)
+        get_tracker().subscribe(chat_id, product.url, sizes_to_track, priority=priority)
         return 'Success', 200
     except Exception as exc:
         logging.exception(f'Item not found with URL {url}')
         return {'error': 'Not found', 'details': str(exc)}, 200
 
+@bp.delete('/follow/<chat_id>')
+def unfollow_item(chat_id):
+    url = (request.get_json(silent=True) or {}).get('url')
+    if not url:
+        return 'URL parameter is missing', 400
+
+    parsed = parse_zara_url(url)
+    url = f"https://www.zara.com/nl/en/{parsed['product']}.html?v1={parsed['v1']}"
+    get_persist().remove_product(chat_id, url)
+    get_tracker().unsubscribe(chat_id, url)
+    return 'Success', 200
+
+@bp.get('/tracker/stats')
+def get_tracker_stats():
+    # Scheduling lag, load level and stretched intervals, plus Zara client counters.
+    return get_tracker().stats()
+
 # Run the app if the script is executed
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5508)
+    create_app().run(debug=True, host='0.0.0.0', port=5508)
@@ -0,0 +1,103 @@
+import zara.api
+from zara import cache as product_cache
+from zara.cache import ProductCache
+from zara.product import Product
+
+URL = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_product(name="Basic T-Shirt"):
+    return Product(URL, 123, name, {383659357: "S", 383659358: "M"}, "452744597")
+
+
+def test_round_trip_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = ProductCache(path, ttl=60, max_entries=10)
+    reader = ProductCache(path, ttl=60, max_entries=10)  # e.g. another worker process
+
+    assert reader.get("basic-t-shirt-p01887455", "452744597") is None
+    writer.put("basic-t-shirt-p01887455", "452744597", make_product())
+    cached = reader.get("basic-t-shirt-p01887455", "452744597")
+
+    assert (cached.url, cached.productId, cached.name, cached.v1) == (URL, 123, "Basic T-Shirt", "452744597")
+    assert cached.sizes == {383659357: "S", 383659358: "M"}
+    stats = reader.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"], stats["entries"]) == (1, 1, 0.5, 1)
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    clock = FakeClock()
+    cache = ProductCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=10, clock=clock)
+    cache.put("p", "1", make_product())
+
+    clock.now += 59
+    assert cache.get("p", "1") is not None
+    clock.now += 2
+    assert cache.get("p", "1") is None
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    clock = FakeClock()
+    cache = ProductCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=2, clock=clock)
+    for key in ("a", "b"):
+        clock.now += 1
+        cache.put(key, "1", make_product(key))
+    clock.now += 1
+    cache.get("a", "1")
+    clock.now += 1
+    cache.put("c", "1", make_product("c"))
+
+    assert cache.get("b", "1") is None
+    assert [cache.get(key, "1").name for key in ("a", "c")] == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_respects_min_age(tmp_path):
+    clock = FakeClock()
+    cache = ProductCache(str(tmp_path / "cache.sqlite3"), ttl=600, max_entries=10, clock=clock)
+    cache.put("p", "1", make_product())
+
+    assert not cache.invalidate("p", "1", min_age=300)
+    clock.now += 300
+    assert cache.invalidate("p", "1", min_age=300)
+    assert cache.get("p", "1") is None
+
+
+def test_get_product_scrapes_only_on_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(product_cache, "_default", ProductCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=10))
+    scraped = []
+
+    def fake_view_payload(url):
+        scraped.append(url)
+        return '{"product": {"name": "Basic T-Shirt", "detail": {"colors": [{"productId": 123, "sizes": [{"sku": 1, "name": "S"}]}]}}}'
+
+    monkeypatch.setattr(zara.api, "get_view_payload", fake_view_payload)
+
+    first = zara.api.get_product("basic-t-shirt-p01887455", "452744597")
+    second = zara.api.get_product("basic-t-shirt-p01887455", "452744597")
+
+    assert scraped == [URL]
+    assert (second.productId, second.sizes) == (first.productId, first.sizes) == (123, {1: "S"})
+
+
+def test_known_skus_live_with_the_entry(tmp_path):
+    clock = FakeClock()
+    cache = ProductCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=10, clock=clock)
+    cache.remember_skus("p", "1", {1, 2})  # no entry yet: nothing to record on
+    cache.put("p", "1", make_product())
+    assert cache.known_skus("p", "1") is None
+
+    cache.remember_skus("p", "1", {383659357, 383659358, 999})
+    assert cache.known_skus("p", "1") == {383659357, 383659358, 999}
+    assert cache.get("p", "1").sizes == {383659357: "S", 383659358: "M"}
+
+    cache.put("p", "1", make_product())  # a fresh scrape starts over
+    assert cache.known_skus("p", "1") is None
@@ -0,0 +1,122 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from zara import client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(client, "config", client.ClientConfig(backoff_base=0, backoff_max=0))
+    monkeypatch.setattr(client, "counters", client.Counter())
+    monkeypatch.setattr(client, "latencies", {stage: client.LatencyWindow() for stage in client.STAGES})
+    monkeypatch.setattr(client, "_retry_budget", client.RetryBudget(0.2, 10))
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ScriptedSession:
+    """Returns (or raises) the scripted outcomes in order, recording call kwargs."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.responses = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        self.responses.append(FakeResponse(outcome))
+        return self.responses[-1]
+
+
+def test_request_uses_stage_timeouts():
+    session = ScriptedSession(200)
+    client.request(session, "GET", "https://example", "availability")
+    assert session.calls[0]["timeout"] == (3.05, 3.0)
+
+
+def test_request_retries_transient_failures():
+    session = ScriptedSession(requests.ConnectTimeout(), 503, 200)
+    response = client.request(session, "GET", "https://example", "page")
+
+    assert response.status_code == 200
+    assert client.counters["page.retries"] == 2
+    assert client.counters["page.timeouts"] == 1
+    assert client.counters["page.status_503"] == 1
+    # The retried response is released; the returned one is left to the caller.
+    assert [r.closed for r in session.responses] == [True, False]
+
+
+def test_request_gives_up_after_max_retries():
+    session = ScriptedSession(requests.ConnectionError(), requests.ConnectionError(), requests.ConnectionError())
+    with pytest.raises(requests.ConnectionError):
+        client.request(session, "GET", "https://example", "page")
+    assert len(session.calls) == 3
+    assert client.counters["page.failures"] == 1
+
+
+def test_retry_budget_limits_retries(monkeypatch):
+    monkeypatch.setattr(client, "_retry_budget", client.RetryBudget(0.0, 1))
+    session = ScriptedSession(500, 500, 500)
+    response = client.request(session, "GET", "https://example", "page")
+
+    assert response.status_code == 500
+    assert len(session.calls) == 2
+
+
+def test_hedged_get_fires_second_request(monkeypatch):
+    monkeypatch.setattr(client, "config", client.ClientConfig(hedge=True, hedge_after=0.05))
+    release = threading.Event()
+    calls = []
+
+    def fake_request(session, method, url, stage, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            release.wait(1)
+            return SimpleNamespace(status_code=200, which="primary")
+        return SimpleNamespace(status_code=200, which="hedge")
+
+    monkeypatch.setattr(client, "request", fake_request)
+    started = time.monotonic()
+    response = client.hedged_get("https://example", "availability")
+    release.set()
+
+    assert response.which == "hedge"
+    assert time.monotonic() - started < 0.5
+    assert client.counters["availability.hedges"] == 1
+    assert client.counters["availability.hedge_wins"] == 1
+
+
+def test_concurrent_callers_do_not_queue_into_hedges(monkeypatch):
+    # 40 callers (more than any fixed pool) each answering well within the hedge delay.
+    monkeypatch.setattr(client, "config", client.ClientConfig(hedge=True, hedge_after=0.1))
+    monkeypatch.setattr(client, "request", lambda *args, **kwargs: time.sleep(0.04) or SimpleNamespace(status_code=200))
+
+    callers = [threading.Thread(target=client.hedged_get, args=("https://example", "availability")) for _ in range(40)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+
+    assert client.counters["availability.hedges"] == 0
+
+
+def test_hedging_waits_for_enough_samples(monkeypatch):
+    monkeypatch.setattr(client, "config", client.ClientConfig(hedge=True))
+    assert client._hedge_delay("availability") is None
+    for ms in range(1, 101):
+        client.latencies["availability"].add(ms / 1000)
+    assert client._hedge_delay("availability") == pytest.approx(0.095)
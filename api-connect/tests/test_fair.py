@@ -0,0 +1,96 @@
+from fair import FairQueue
+
+
+def drain(queue, n=None):
+    order = []
+    while n is None or len(order) < n:
+        popped = queue.pop()
+        if popped is None:
+            break
+        key, _item, owners = popped
+        order.append(key)
+        queue.done(owners)
+    return order
+
+
+def test_casual_chat_is_not_starved_by_heavy_chat():
+    queue = FairQueue()
+    for i in range(100):
+        queue.push(f"heavy{i}", None, {"heavy": 1.0})
+    queue.push("casual0", None, {"casual": 1.0})
+    queue.push("casual1", None, {"casual": 1.0})
+
+    order = drain(queue, 4)
+    assert order.count("casual0") + order.count("casual1") == 2
+
+
+def test_weights_set_share():
+    queue = FairQueue()
+    for i in range(30):
+        queue.push(f"a{i}", None, {"a": 2.0})
+        queue.push(f"b{i}", None, {"b": 1.0})
+
+    order = drain(queue, 30)
+    assert sum(key.startswith("a") for key in order) == 20
+
+
+def test_shared_item_dispatched_once_and_cost_split():
+    queue = FairQueue()
+    queue.push("shared", "item", {"a": 1.0, "b": 1.0})
+    queue.push("a1", None, {"a": 1.0})
+    queue.push("b1", None, {"b": 1.0})
+    queue.push("c1", None, {"c": 1.0})
+    queue.push("c2", None, {"c": 1.0})
+
+    order = drain(queue)
+    assert sorted(order) == ["a1", "b1", "c1", "c2", "shared"]
+    assert order.count("shared") == 1
+    # a and b each paid half for "shared", so both are served before c's second item.
+    assert order.index("c2") == len(order) - 1
+
+
+def test_quota_limits_in_flight_per_chat_while_others_wait():
+    queue = FairQueue(quota=2)
+    for i in range(5):
+        queue.push(f"heavy{i}", None, {"heavy": 4.0})
+    for i in range(3):
+        queue.push(f"casual{i}", None, {"casual": 1.0})
+
+    # By weight heavy is owed the 4th slot, but it is at quota and casual is waiting.
+    assert [queue.pop()[0] for _ in range(4)] == ["heavy0", "casual0", "heavy1", "casual1"]
+    # Both at quota: capacity is not left idle.
+    assert queue.pop()[0] == "heavy2"
+
+
+def test_quota_does_not_idle_capacity():
+    queue = FairQueue(quota=2)
+    for i in range(5):
+        queue.push(f"heavy{i}", None, {"heavy": 1.0})
+
+    # Nobody else is waiting, so the lone chat may exceed its quota.
+    assert [queue.pop()[0] for _ in range(5)] == [f"heavy{i}" for i in range(5)]
+    assert queue.pop() is None
+
+
+def test_idle_chat_does_not_bank_credit():
+    queue = FairQueue()
+    for i in range(10):
+        queue.push(f"a{i}", None, {"a": 1.0})
+    drain(queue, 10)
+
+    for i in range(3):
+        queue.push(f"a{10 + i}", None, {"a": 1.0})
+        queue.push(f"b{i}", None, {"b": 1.0})
+    order = drain(queue, 2)
+    assert sorted(key[0] for key in order) == ["a", "b"]
+
+
+def test_discard_and_backlog():
+    queue = FairQueue()
+    queue.push("x", None, {"a": 1.0, "b": 1.0})
+    queue.push("y", None, {"a": 1.0})
+    assert queue.backlog() == {"a": 2, "b": 1}
+
+    queue.discard("x")
+    assert len(queue) == 1
+    assert drain(queue) == ["y"]
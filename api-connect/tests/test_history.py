@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta, timezone
+
+from history import AvailabilityHistory
+
+
+class FakePersist:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.partitions = set()
+        self.copies = []
+
+    def ensure_history_partitions(self, days):
+        self.partitions |= set(days)
+
+    def copy_availability(self, rows):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.copies.append(list(rows))
+
+    def drop_history_before(self, cutoff):
+        dropped = sorted(day for day in self.partitions if day < cutoff)
+        self.partitions -= set(dropped)
+        return dropped
+
+
+T0 = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def test_records_only_transitions():
+    persist = FakePersist()
+    history = AvailabilityHistory(persist)
+
+    history.record(123, [(1, False), (2, False)], observed_at=T0)
+    history.record(123, [(1, False), (2, False)], observed_at=T0 + timedelta(seconds=5))
+    history.record(123, [(1, True), (2, False)], observed_at=T0 + timedelta(seconds=10))
+
+    assert history.flush() == 3
+    assert persist.copies == [[
+        (T0, "123", 1, False),
+        (T0, "123", 2, False),
+        (T0 + timedelta(seconds=10), "123", 1, True),
+    ]]
+    assert persist.partitions == {date(2026, 10, 19)}
+
+
+def test_failed_flush_keeps_rows_for_retry():
+    persist = FakePersist(fail=True)
+    history = AvailabilityHistory(persist)
+    history.record(123, [(1, True)], observed_at=T0)
+
+    assert history.flush() == 0
+    persist.fail = False
+    assert history.flush() == 1
+    assert persist.copies == [[(T0, "123", 1, True)]]
+
+
+def test_buffer_is_bounded():
+    history = AvailabilityHistory(FakePersist(), max_buffer=2)
+    history.record(123, [(1, True), (2, True), (3, True)], observed_at=T0)
+
+    assert history.dropped == 1
+    assert history.flush() == 2
+
+
+def test_compact_drops_old_partitions():
+    persist = FakePersist()
+    today = datetime.now(timezone.utc).date()
+    persist.partitions = {today - timedelta(days=100), today - timedelta(days=1), today}
+    history = AvailabilityHistory(persist, retention_days=90)
+
+    assert history.compact() == [today - timedelta(days=100)]
+    assert persist.partitions == {today - timedelta(days=1), today}
@@ -0,0 +1,58 @@
+from load import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, LoadMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_monitor():
+    clock = FakeClock()
+    return LoadMonitor(lag_threshold=2.0, max_level=3, evaluate_every=10, smoothing=1.0, clock=clock), clock
+
+
+def test_level_rises_under_sustained_lag_and_recovers():
+    monitor, clock = make_monitor()
+
+    for _ in range(5):
+        clock.now += 10
+        monitor.observe(5.0)
+    assert monitor.level == 3
+
+    clock.now += 10
+    monitor.observe(1.5)  # between threshold/2 and threshold: hold
+    assert monitor.level == 3
+
+    for _ in range(5):
+        clock.now += 10
+        monitor.observe(0.1)
+    assert monitor.level == 0
+
+
+def test_level_changes_are_rate_limited():
+    monitor, clock = make_monitor()
+    clock.now += 10
+    assert monitor.observe(5.0) is True
+    assert monitor.observe(5.0) is False
+    assert monitor.level == 1
+
+
+def test_stretch_by_priority():
+    monitor, _clock = make_monitor()
+    assert [monitor.stretch(p) for p in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)] == [1, 1, 1]
+    monitor.level = 1
+    assert [monitor.stretch(p) for p in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)] == [1, 1, 2]
+    monitor.level = 3
+    assert [monitor.stretch(p) for p in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)] == [1, 4, 8]
+
+
+def test_overruns_are_counted():
+    monitor, _clock = make_monitor()
+    monitor.observe(0.0, duration=7.0, interval=5.0)
+    monitor.observe(0.0, duration=1.0, interval=5.0)
+    stats = monitor.stats()
+    assert stats["counters"] == {"polls": 2, "overruns": 1}
+    assert stats["lag_p95"] == 0.0
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from zara.payload import PayloadPathError, extract, extract_product, sizes_by_sku
+
+DOC = {
+    "seo": {"title": "Shirt } ] { [", "tags": ["a", "b\"c", {"d": [1, 2, {"e": None}]}]},
+    "navigation": [[1, 2.5e3, -3], True, False, None, "x\\y"],
+    "pro\"duct": {"name": "decoy"},
+    "product": {
+        "id": 1,
+        "name": "BASIC T-SHIRT",
+        "detail": {
+            "colors": [
+                {"productId": 452744597, "xmedia": [{"path": "/a"}], "sizes": [{"sku": "11", "name": "S"}, {"sku": 12, "name": "M"}]},
+                {"productId": 2, "sizes": []},
+            ]
+        },
+    },
+    "analytics": {"events": list(range(100))},
+}
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_extract_product_matches_full_decode(indent):
+    text = json.dumps(DOC, indent=indent)
+    assert extract_product(text) == {
+        "name": "BASIC T-SHIRT",
+        "productId": 452744597,
+        "sizes": [{"sku": "11", "name": "S"}, {"sku": 12, "name": "M"}],
+    }
+
+
+def test_extract_array_index_and_escaped_keys():
+    text = json.dumps(DOC)
+    assert extract(text, {"second": ("product", "detail", "colors", 1, "productId")}) == {"second": 2}
+    assert extract(text, {"quoted": ('pro"duct', "name")}) == {"quoted": "decoy"}
+    assert extract('{"caf\\u00e9": 1}', {"v": ("café",)}) == {"v": 1}
+    assert extract('{"café": 1, "naïve": {"ключ": 2}}', {"v": ("café",), "w": ("naïve", "ключ")}) == {"v": 1, "w": 2}
+
+
+@pytest.mark.parametrize("path", [("missing",), ("product", "detail", "colors", 5), ("product", "name", "x")])
+def test_missing_path_raises(path):
+    with pytest.raises(PayloadPathError):
+        extract(json.dumps(DOC), {"v": path})
+
+
+def test_sizes_by_sku():
+    assert sizes_by_sku([{"sku": "11", "name": "S"}, {"sku": 12, "name": "M"}]) == {11: "S", 12: "M"}
@@ -1,8 +1,11 @@
+import json
+import time
 import types
 from types import SimpleNamespace
 from typing import Dict, List, Tuple
 
 import persist
+from load import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
 
 
 class FakeCursor:
@@ -23,7 +26,7 @@ class FakeCursor:
         self.results = []
         self.rowcount = 0
 
-        if normalized.startswith("create table") or normalized.startswith("create unique index"):
+        if normalized.startswith(("create table", "create unique index", "create index", "alter table", "do $$")):
             return
 
         if normalized.startswith("insert into users"):
@@ -34,41 +37,80 @@ class FakeCursor:
             return
 
         if normalized.startswith("insert into products"):
-            product_id, name, url, v1 = params
+            product_id, name, url, v1, sizes = params
             existing = next(
                 (p for p in self.store["products"] if p["product_id"] == product_id and p["name"] == name and p["v1"] == v1),
                 None,
             )
             if existing:
                 existing["url"] = url
+                if sizes is not None:
+                    existing["sizes"] = sizes
+                    existing["refreshed_at"] = time.time()
                 product_db_id = existing["id"]
             else:
                 product_db_id = len(self.store["products"]) + 1
                 self.store["products"].append(
-                    {"id": product_db_id, "product_id": product_id, "name": name, "url": url, "v1": v1}
+                    {
+                        "id": product_db_id,
+                        "product_id": product_id,
+                        "name": name,
+                        "url": url,
+                        "v1": v1,
+                        "sizes": sizes,
+                        "refreshed_at": time.time(),
+                    }
                 )
                 self.rowcount = 1
             self.results = [(product_db_id,)]
             return
 
         if normalized.startswith("insert into subscriptions"):
-            chat_id, product_db_id, selected_sizes = params
+            chat_id, product_db_id, selected_sizes, priority = params
             sub = next((s for s in self.store["subscriptions"] if s["chat_id"] == chat_id and s["product_id"] == product_db_id), None)
             if not sub:
                 self.store["subscriptions"].append(
-                    {"chat_id": chat_id, "product_id": product_db_id, "selected_sizes": selected_sizes}
+                    {"chat_id": chat_id, "product_id": product_db_id, "selected_sizes": selected_sizes, "priority": priority}
                 )
                 self.rowcount = 1
             return
 
         if normalized.startswith("update subscriptions"):
-            selected_sizes, chat_id, product_db_id = params
+            selected_sizes, priority, chat_id, product_db_id = params
             for sub in self.store["subscriptions"]:
                 if sub["chat_id"] == chat_id and sub["product_id"] == product_db_id:
-                    sub["selected_sizes"] = selected_sizes
+                    if selected_sizes is not None:
+                        sub["selected_sizes"] = selected_sizes
+                    if priority is not None:
+                        sub["priority"] = priority
                     self.rowcount = 1
             return
 
+        if normalized.startswith("delete from subscriptions s using products p, unnest"):
+            pairs = set(zip(*params))
+            urls = {p["id"]: p["url"] for p in self.store["products"]}
+            before = len(self.store["subscriptions"])
+            self.store["subscriptions"] = [
+                s for s in self.store["subscriptions"] if (s["chat_id"], urls[s["product_id"]]) not in pairs
+            ]
+            self.rowcount = before - len(self.store["subscriptions"])
+            return
+
+        if normalized.startswith("update products p set last_seen_at"):
+            seen = dict(zip(*params))
+            for product in self.store["products"]:
+                if product["url"] in seen:
+                    product["last_seen_at"] = seen[product["url"]]
+                    product["error_count"] = 0
+            return
+
+        if normalized.startswith("update products p set error_count"):
+            errors = dict(zip(*params))
+            for product in self.store["products"]:
+                if product["url"] in errors:
+                    product["error_count"] = product.get("error_count", 0) + errors[product["url"]]
+            return
+
         if normalized.startswith("delete from subscriptions"):
             chat_id, url = params
             product = next((p for p in self.store["products"] if p["url"] == url), None)
@@ -88,6 +130,16 @@ class FakeCursor:
             self.rowcount = len(self.results)
             return
 
+        if normalized.startswith("select product_id, name, url, v1, sizes from products"):
+            url, max_age = params
+            self.results = [
+                (p["product_id"], p["name"], p["url"], p["v1"], p["sizes"])
+                for p in self.store["products"]
+                if p["url"] == url and p["sizes"] is not None and time.time() - p["refreshed_at"] < max_age
+            ]
+            self.rowcount = len(self.results)
+            return
+
         if normalized.startswith("select p.product_id"):
             chat_id = params[0]
             products = []
@@ -100,6 +152,17 @@ class FakeCursor:
             self.rowcount = len(self.results)
             return
 
+        if normalized.startswith("select s.priority"):
+            chat_id, url = params
+            product = next((p for p in self.store["products"] if p["url"] == url), None)
+            sub = product and next(
+                (s for s in self.store["subscriptions"] if s["chat_id"] == chat_id and s["product_id"] == product["id"]), None
+            )
+            if sub:
+                self.results = [(sub["priority"],)]
+                self.rowcount = 1
+            return
+
         if normalized.startswith("select s.selected_sizes"):
             chat_id, url = params
             product = next((p for p in self.store["products"] if p["url"] == url), None)
@@ -111,6 +174,36 @@ class FakeCursor:
                 self.rowcount = 1
             return
 
+        if normalized.startswith("select s.chat_id, p.url"):
+            products = {p["id"]: p for p in self.store["products"]}
+            self.results = [
+                (s["chat_id"], products[s["product_id"]]["url"], s["selected_sizes"], s["priority"])
+                for s in self.store["subscriptions"]
+            ]
+            self.rowcount = len(self.results)
+            return
+
+        if normalized.startswith("insert into tracker_events"):
+            events = self.store.setdefault("tracker_events", [])
+            events.append((len(events) + 1,) + tuple(params))
+            self.rowcount = 1
+            return
+
+        if normalized.startswith("notify"):
+            self.store.setdefault("notified", []).append(normalized.split()[1].rstrip(";"))
+            return
+
+        if normalized.startswith("delete from tracker_events"):
+            limit = params[0]
+            events = self.store.setdefault("tracker_events", [])
+            self.results, self.store["tracker_events"] = events[:limit], events[limit:]
+            self.rowcount = len(self.results)
+            return
+
+    def copy_expert(self, sql: str, file):
+        assert sql.startswith("COPY availability_history")
+        self.store.setdefault("history", []).extend(line.split("\t") for line in file.read().splitlines())
+
     def fetchone(self):
         return self.results[0] if self.results else None
 
@@ -148,8 +241,8 @@ def setup_fake_db(monkeypatch):
     return store
 
 
-def make_product(product_id: str, name: str, url: str, v1: str):
-    return SimpleNamespace(productId=product_id, name=name, url=url, v1=v1)
+def make_product(product_id: str, name: str, url: str, v1: str, sizes=None):
+    return SimpleNamespace(productId=product_id, name=name, url=url, v1=v1, sizes=sizes)
 
 
 def test_add_and_get_products(monkeypatch):
@@ -202,12 +295,12 @@ def test_remove_product(monkeypatch):
     p.add_subscription("chat1", prod2)
 
     p.remove_product("chat1", "url1")
-    assert store["subscriptions"] == [{"chat_id": "chat1", "product_id": 2, "selected_sizes": None}]
+    assert store["subscriptions"] == [{"chat_id": "chat1", "product_id": 2, "selected_sizes": None, "priority": PRIORITY_NORMAL}]
     assert p.get_urls_by_chat_id("chat1") == ["url2"]
 
     # Removing non-existent entry should be a no-op
     p.remove_product("chat1", "url3")
-    assert store["subscriptions"] == [{"chat_id": "chat1", "product_id": 2, "selected_sizes": None}]
+    assert store["subscriptions"] == [{"chat_id": "chat1", "product_id": 2, "selected_sizes": None, "priority": PRIORITY_NORMAL}]
 
 
 def test_get_selected_sizes(monkeypatch):
@@ -226,3 +319,165 @@ def test_user_exist(monkeypatch):
     assert p.user_exist("chat1") is False
     p.add_subscription("chat1", make_product("p1", "Product 1", "url1", "v1a"))
     assert p.user_exist("chat1") is True
+
+
+def test_get_product_by_url(monkeypatch):
+    store = setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+
+    assert p.get_product_by_url("url1", max_age_seconds=60) is None
+
+    sizes = {383659357: "XS", 383659358: "S"}
+    p.add_subscription("chat1", make_product("p1", "Product 1", "url1", "v1a", sizes=sizes))
+    assert json.loads(store["products"][0]["sizes"]) == {"383659357": "XS", "383659358": "S"}
+
+    cached = p.get_product_by_url("url1", max_age_seconds=60)
+    assert (cached.productId, cached.name, cached.url, cached.v1) == ("p1", "Product 1", "url1", "v1a")
+    assert cached.sizes == sizes
+
+    # Stale entries are treated as misses.
+    store["products"][0]["refreshed_at"] -= 120
+    assert p.get_product_by_url("url1", max_age_seconds=60) is None
+
+
+def test_cached_subscription_keeps_freshness(monkeypatch):
+    store = setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+
+    prod = make_product("p1", "Product 1", "url1", "v1a", sizes={1: "S"})
+    p.add_subscription("chat1", prod)
+    store["products"][0]["refreshed_at"] -= 30
+
+    p.add_subscription("chat2", p.get_product_by_url("url1", max_age_seconds=60), refresh=False)
+
+    assert len(store["subscriptions"]) == 2
+    assert p.get_product_by_url("url1", max_age_seconds=20) is None
+
+
+class RecordingCursor:
+    def __init__(self, applied):
+        self.applied = applied
+        self.statements = []
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.lower().split())
+        self.statements.append(normalized)
+        self.result = None
+        if normalized.startswith("select 1 from schema_migrations"):
+            self.result = (1,) if params[0] in self.applied else None
+        elif normalized.startswith("insert into schema_migrations"):
+            self.applied.add(params[0])
+
+    def fetchone(self):
+        return self.result
+
+
+def test_migrations_apply_once():
+    import migrations
+
+    applied = set()
+    cursors = []
+
+    def cursor():
+        cursors.append(RecordingCursor(applied))
+        return cursors[-1]
+
+    conn = SimpleNamespace(cursor=cursor, commit=lambda: None)
+
+    versions = [version for version, _name, _statements in migrations.MIGRATIONS]
+    assert migrations.migrate(conn) == versions
+    assert applied == set(versions)
+    assert any("create table if not exists products" in s for c in cursors for s in c.statements)
+
+    cursors.clear()
+    assert migrations.migrate(conn) == []
+    assert not any(s.startswith("alter table") for c in cursors for s in c.statements)
+
+
+def test_copy_availability(monkeypatch):
+    from datetime import datetime, timezone
+
+    store = setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+    observed = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+    p.copy_availability([(observed, "123", 383659357, True), (observed, "123", 383659358, False)])
+
+    assert store["history"] == [
+        ["2026-10-19T12:00:00+00:00", "123", "383659357", "t"],
+        ["2026-10-19T12:00:00+00:00", "123", "383659358", "f"],
+    ]
+
+
+def test_tracker_event_queue(monkeypatch):
+    store = setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+
+    p.enqueue_tracker_event("subscribe", "chat1", "https://z/1", ["M"], 1)
+    p.enqueue_tracker_event("unsubscribe", "chat1", "https://z/1")
+    p.enqueue_tracker_event("subscribe", "chat2", "https://z/2")
+
+    assert store["notified"] == ["tracker_events"] * 3
+    first = p.claim_tracker_events(limit=2)
+    assert [(e["kind"], e["chat_id"], e["selected_sizes"], e["priority"]) for e in first] == [
+        ("subscribe", "chat1", ["M"], 1),
+        ("unsubscribe", "chat1", None, None),
+    ]
+    assert [e["chat_id"] for e in p.claim_tracker_events(limit=2)] == ["chat2"]
+    assert p.claim_tracker_events() == []
+
+
+def test_get_all_subscriptions(monkeypatch):
+    setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+    p.add_subscription("chat1", make_product("1", "A", "https://z/a", "1", {1: "S"}), selected_sizes=["S"])
+    p.add_subscription("chat2", make_product("1", "A", "https://z/a", "1", {1: "S"}), priority=PRIORITY_LOW)
+    p.add_subscription("chat1", make_product("1", "A", "https://z/a", "1", {1: "S"}), priority=PRIORITY_HIGH)
+
+    assert p.get_all_subscriptions() == [
+        ("chat1", "https://z/a", ["S"], PRIORITY_HIGH),
+        ("chat2", "https://z/a", [], PRIORITY_LOW),
+    ]
+
+
+def test_apply_tracker_writes(monkeypatch):
+    from datetime import datetime, timezone
+
+    store = setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+    for chat_id in ("chat1", "chat2", "chat3"):
+        p.add_subscription(chat_id, make_product("1", "A", "https://z/a", "1", {1: "S"}))
+    p.add_subscription("chat1", make_product("2", "B", "https://z/b", "2", {1: "S"}))
+    seen_at = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+    removed = p.apply_tracker_writes(
+        [("chat1", "https://z/a"), ("chat2", "https://z/a"), ("chat9", "https://z/a")],
+        {"https://z/a": seen_at},
+        {"https://z/b": 2},
+    )
+
+    assert removed == 2
+    assert [(s["chat_id"], s["product_id"]) for s in store["subscriptions"]] == [("chat3", 1), ("chat1", 2)]
+    a, b = store["products"]
+    assert (a["last_seen_at"], a["error_count"]) == (seen_at, 0)
+    assert b["error_count"] == 2
+
+
+def test_refollow_without_priority_keeps_it(monkeypatch):
+    setup_fake_db(monkeypatch)
+    p = persist.Persist(database_url="postgresql://fake")
+    product = make_product("1", "A", "https://z/a", "1", {1: "S", 2: "M"})
+    p.add_subscription("chat1", product, selected_sizes=["S"], priority=PRIORITY_HIGH)
+
+    p.add_subscription("chat1", product, selected_sizes=["M"])
+
+    assert p.get_subscription_priority("chat1", "https://z/a") == PRIORITY_HIGH
+    assert p.get_selected_sizes("chat1", "https://z/a") == ["M"]
+    assert p.get_subscription_priority("chat2", "https://z/a") is None
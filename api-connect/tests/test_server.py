@@ -0,0 +1,138 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import server
+from load import PRIORITY_HIGH, PRIORITY_NORMAL
+from zara.product import Product
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget for `import server; server.create_app()` in a fresh interpreter.
+COLD_START_TARGET_SECONDS = 1.0
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import server
+server.create_app()
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("requests", "apscheduler", "tracker", "zara.api") if m in sys.modules]
+print(json.dumps({"elapsed": elapsed, "heavy": heavy}))
+"""
+
+
+def test_cold_start_is_lazy_and_fast():
+    # An unreachable database proves create_app() never connects.
+    env = {**os.environ, "DATABASE_URL": "postgresql://nobody@127.0.0.1:1/none"}
+    out = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT],
+        cwd=API_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"cold start: {result['elapsed'] * 1000:.1f} ms")
+
+    assert result["heavy"] == []
+    assert result["elapsed"] < COLD_START_TARGET_SECONDS
+
+
+class FakePersist:
+    def __init__(self, cached=None, stored_priority=None):
+        self.cached = cached
+        self.stored_priority = stored_priority
+        self.subscriptions = []
+
+    def get_product_by_url(self, url, max_age_seconds):
+        return self.cached
+
+    def add_subscription(self, chat_id, product, selected_sizes=None, refresh=True, priority=None):
+        self.subscriptions.append((chat_id, product.productId, selected_sizes, refresh, priority))
+        return self.stored_priority is None, self.stored_priority is not None
+
+    def get_subscription_priority(self, chat_id, url):
+        return self.stored_priority
+
+
+def test_follow_uses_stored_product(monkeypatch):
+    import zara.api
+
+    def fail(*_args):
+        raise AssertionError("get_product should not be called for a cached product")
+
+    monkeypatch.setattr(zara.api, "get_product", fail)
+
+    url = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597"
+    persist = FakePersist(Product(url, 123, "Basic T-Shirt", {1: "S", 2: "M"}, "452744597"))
+    subscribed = []
+    tracker = SimpleNamespace(subscribe=lambda *args, **kwargs: subscribed.append((args, kwargs)))
+    client = server.create_app(persist=persist, tracker=tracker).test_client()
+
+    response = client.post("/follow/chat1", json={"url": url, "sizes": ["M"]})
+
+    assert response.status_code == 200
+    assert persist.subscriptions == [("chat1", 123, ["M"], False, None)]
+    assert subscribed == [(("chat1", url, ["M"]), {"priority": PRIORITY_NORMAL})]
+
+
+def test_follow_passes_priority():
+    url = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597"
+    persist = FakePersist(Product(url, 123, "Basic T-Shirt", {1: "S", 2: "M"}, "452744597"))
+    subscribed = []
+    tracker = SimpleNamespace(subscribe=lambda *args, **kwargs: subscribed.append(kwargs["priority"]))
+    client = server.create_app(persist=persist, tracker=tracker).test_client()
+
+    assert client.post("/follow/chat1", json={"url": url, "sizes": ["M"], "priority": "high"}).status_code == 200
+    assert client.post("/follow/chat1", json={"url": url, "sizes": ["M"], "priority": "urgent"}).status_code == 400
+
+    assert persist.subscriptions[0][-1] == PRIORITY_HIGH
+    assert subscribed == [PRIORITY_HIGH]
+
+
+def test_refollow_without_priority_keeps_stored_priority():
+    url = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597"
+    product = Product(url, 123, "Basic T-Shirt", {1: "S", 2: "M"}, "452744597")
+    persist = FakePersist(product, stored_priority=PRIORITY_HIGH)
+    subscribed = []
+    tracker = SimpleNamespace(subscribe=lambda *args, **kwargs: subscribed.append(kwargs["priority"]))
+    client = server.create_app(persist=persist, tracker=tracker).test_client()
+
+    assert client.post("/follow/chat1", json={"url": url, "sizes": ["S"]}).status_code == 200
+
+    assert persist.subscriptions[0][-1] is None
+    assert subscribed == [PRIORITY_HIGH]
+
+
+def test_external_mode_queues_instead_of_tracking(monkeypatch):
+    from tracker_queue import QueuedTracker
+
+    monkeypatch.setattr(server, "TRACKER_MODE", "external")
+    app = server.create_app(persist=SimpleNamespace())
+
+    with app.app_context():
+        tracker = server.get_tracker()
+
+    assert isinstance(tracker, QueuedTracker)
+    assert app.extensions["shppd"]["tracker"] is tracker
+
+
+def test_unfollow_removes_and_unsubscribes():
+    removed, unsubscribed = [], []
+    persist = SimpleNamespace(remove_product=lambda *args: removed.append(args))
+    tracker = SimpleNamespace(unsubscribe=lambda *args: unsubscribed.append(args))
+    client = server.create_app(persist=persist, tracker=tracker).test_client()
+
+    url = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597&utm=x"
+    response = client.delete("/follow/chat1", json={"url": url})
+
+    canonical = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597"
+    assert response.status_code == 200
+    assert removed == [("chat1", canonical)]
+    assert unsubscribed == [("chat1", canonical)]
+    assert client.delete("/follow/chat1", json={}).status_code == 400
+    assert client.delete("/follow/chat1").status_code == 400
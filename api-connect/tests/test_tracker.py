@@ -0,0 +1,194 @@
+import threading
+
+import pytest
+
+import tracker
+from zara import cache as product_cache
+from zara.cache import ProductCache
+from zara.product import Product
+
+
+class FakeHistory:
+    def __init__(self):
+        self.records = []
+        self.compacted = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def compact(self):
+        self.compacted += 1
+        return []
+
+    def record(self, product_id, stock):
+        self.records.append(product_id)
+
+
+class FakePersist:
+    def __init__(self):
+        self.removed = []
+        self.seen = []
+        self.errors = []
+
+    def get_selected_sizes(self, chat_id, url):
+        return None
+
+    def apply_tracker_writes(self, removals, seen, errors):
+        self.removed.extend(removals)
+        self.seen.extend(seen)
+        self.errors.extend(errors.items())
+        return len(removals)
+
+
+URL = "https://www.zara.com/nl/en/basic-t-shirt-p01887455.html?v1=452744597"
+
+
+@pytest.fixture
+def make_tracker(monkeypatch, tmp_path):
+    monkeypatch.setattr(product_cache, "_default", ProductCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=10))
+    monkeypatch.setattr(tracker, "POLL_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(tracker, "WHEEL_TICK_SECONDS", 0.01)
+    instances = []
+
+    def make(stock, failing=()):
+        fetches = []
+        notified = []
+        attempts = []
+
+        def fake_get_product(product, v1):
+            fetches.append(product)
+            return Product(URL, 123, "Basic T-Shirt", {1: "S", 2: "M"}, v1)
+
+        monkeypatch.setattr(tracker, "get_product", fake_get_product)
+        monkeypatch.setattr(tracker, "get_stock", lambda product_id: stock)
+        def fake_post(**kwargs):
+            attempts.append(kwargs["json"]["userId"])
+            if kwargs["json"]["userId"] in failing:
+                raise tracker.requests.ConnectionError("bot unreachable")
+            notified.append(kwargs["json"])
+
+        monkeypatch.setattr(tracker.requests, "post", fake_post)
+        t = tracker.Tracker(FakePersist(), history=FakeHistory())
+        t.notify_attempts = attempts
+        instances.append(t)
+        return t, fetches, notified
+
+    yield make
+    for t in instances:
+        t.stop()
+
+
+def wait_for(condition, timeout=2.0):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        event.wait(0.01)
+    return condition()
+
+
+def test_shared_product_is_polled_once_per_cycle(make_tracker):
+    t, fetches, notified = make_tracker([(1, False), (2, False)])
+    t.subscribe("chat1", URL, ["S"])
+    t.subscribe("chat2", URL, ["M"])
+
+    assert wait_for(lambda: len(fetches) >= 3)
+    assert t.stats()["products"] == 1
+    assert t.stats()["subscriptions"] == 2
+    assert notified == []
+
+
+def test_restock_notifies_only_matching_chats(make_tracker):
+    t, fetches, notified = make_tracker([(1, False), (2, True)])
+    t.subscribe("chat1", URL, ["S"])
+    t.subscribe("chat2", URL, ["M"])
+
+    assert wait_for(lambda: notified)
+    assert [n["userId"] for n in notified] == ["chat2"]
+    assert t.stats()["subscriptions"] == 1
+    t.writes.flush()
+    assert t.persist.removed == [("chat2", URL)]
+    assert URL in t.persist.seen
+
+
+def test_failed_notification_does_not_skip_other_chats(make_tracker):
+    t, fetches, notified = make_tracker([(1, True), (2, True)], failing={"chat1"})
+    t.subscribe("chat1", URL, ["S"])
+    t.subscribe("chat2", URL, ["M"])
+
+    assert wait_for(lambda: notified)
+    assert [n["userId"] for n in notified] == ["chat2"]
+    # chat1 keeps its subscription and is retried on the next poll.
+    assert wait_for(lambda: t.notify_attempts.count("chat1") >= 2)
+    assert t.stats()["subscriptions"] == 1
+    t.writes.flush()
+    assert t.persist.removed == [("chat2", URL)]
+
+
+def test_unsubscribe_last_chat_stops_polling(make_tracker):
+    t, fetches, notified = make_tracker([(1, False)])
+    t.subscribe("chat1", URL, ["S"])
+    t.unsubscribe("chat1", URL)
+
+    assert URL not in t.wheel
+    assert t.stats()["products"] == 0
+
+
+def test_new_sku_invalidates_cached_product(make_tracker, monkeypatch):
+    monkeypatch.setattr(tracker, "UNKNOWN_SKU_RECHECK_SECONDS", 0)
+    t, fetches, notified = make_tracker([(1, False), (2, False), (3, True)])
+    cache = product_cache.get_cache()
+    cache.put("basic-t-shirt-p01887455", "452744597", Product(URL, 123, "Basic T-Shirt", {1: "S", 2: "M"}, "452744597"))
+    cache.remember_skus("basic-t-shirt-p01887455", "452744597", {1, 2})
+    t.subscribe("chat1", URL)
+
+    assert wait_for(lambda: cache.stats().get("invalidations"))
+    assert cache.get("basic-t-shirt-p01887455", "452744597") is None
+
+
+def test_sku_outside_size_map_does_not_rescrape(make_tracker, monkeypatch):
+    monkeypatch.setattr(tracker, "UNKNOWN_SKU_RECHECK_SECONDS", 0)
+    # SKU 3 belongs to another colour: availability lists it, the size map never will.
+    t, fetches, notified = make_tracker([(1, False), (2, False), (3, True)])
+    cache = product_cache.get_cache()
+    cache.put("basic-t-shirt-p01887455", "452744597", Product(URL, 123, "Basic T-Shirt", {1: "S", 2: "M"}, "452744597"))
+    t.subscribe("chat1", URL)
+
+    assert wait_for(lambda: len(fetches) >= 3)
+    assert cache.known_skus("basic-t-shirt-p01887455", "452744597") == {1, 2, 3}
+    assert not cache.stats().get("invalidations")
+
+
+def test_resubscribe_while_waiting_for_a_worker_keeps_polling(make_tracker, monkeypatch):
+    monkeypatch.setattr(tracker, "TRACKER_WORKERS", 1)
+    t, fetches, notified = make_tracker([(1, False)])
+    other = "https://www.zara.com/nl/en/other-p02.html?v1=1"
+    release = threading.Event()
+    polled = []
+
+    def blocking_get_product(product, v1):
+        polled.append(product)
+        if product == "basic-t-shirt-p01887455":
+            release.wait(2)
+        return Product(URL, 123, "Basic T-Shirt", {1: "S"}, v1)
+
+    monkeypatch.setattr(tracker, "get_product", blocking_get_product)
+    t.subscribe("chat1", URL)
+    assert wait_for(lambda: polled)  # holds the only worker
+    t.subscribe("chat1", other)
+    assert wait_for(lambda: other in t._queue)
+    t.unsubscribe("chat1", other)
+    t.subscribe("chat1", other)
+    assert wait_for(lambda: t._entries[other].queued)
+    release.set()
+
+    assert wait_for(lambda: "other-p02" in polled)
+
+
+def test_history_is_compacted_at_startup(make_tracker):
+    t, fetches, notified = make_tracker([(1, False)])
+
+    assert wait_for(lambda: t.history.compacted == 1)
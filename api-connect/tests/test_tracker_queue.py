@@ -0,0 +1,116 @@
+import socket
+import threading
+
+from load import PRIORITY_HIGH, PRIORITY_NORMAL
+from tracker_queue import QueuedTracker, TrackerEventConsumer
+from zara import cache as product_cache
+
+
+class FakePersist:
+    def __init__(self, events=()):
+        self.events = list(events)
+        self.enqueued = []
+        self.claims = []
+
+    def enqueue_tracker_event(self, kind, chat_id, url, selected_sizes=None, priority=None):
+        self.enqueued.append((kind, chat_id, url, selected_sizes, priority))
+
+    def claim_tracker_events(self, limit=500):
+        self.claims.append(limit)
+        batch, self.events = self.events[:limit], self.events[limit:]
+        return batch
+
+    def count_tracker_events(self):
+        return len(self.events)
+
+
+class FakeTracker:
+    def __init__(self):
+        self.calls = []
+
+    def subscribe(self, chat_id, url, selected_sizes=None, priority=PRIORITY_NORMAL):
+        self.calls.append(("subscribe", chat_id, url, selected_sizes, priority))
+
+    def unsubscribe(self, chat_id, url):
+        self.calls.append(("unsubscribe", chat_id, url))
+
+
+def event(kind, chat_id, url, selected_sizes=None, priority=None):
+    return {"kind": kind, "chat_id": chat_id, "url": url, "selected_sizes": selected_sizes, "priority": priority}
+
+
+def test_queued_tracker_enqueues_changes(monkeypatch):
+    monkeypatch.setattr(product_cache, "PRODUCT_CACHE_TTL_SECONDS", 0)
+    persist = FakePersist()
+    tracker = QueuedTracker(persist)
+
+    tracker.subscribe("chat1", "https://z/1", ["M"])
+    tracker.unsubscribe("chat1", "https://z/1")
+
+    assert persist.enqueued == [
+        ("subscribe", "chat1", "https://z/1", ["M"], PRIORITY_NORMAL),
+        ("unsubscribe", "chat1", "https://z/1", None, None),
+    ]
+    assert tracker.stats() == {"mode": "external", "pending_events": 0, "product_cache": None}
+
+
+def test_consumer_drains_in_batches_and_order():
+    persist = FakePersist([
+        event("subscribe", "chat1", "https://z/1", ["M"], PRIORITY_HIGH),
+        event("subscribe", "chat2", "https://z/2"),
+        event("unsubscribe", "chat1", "https://z/1"),
+        event("bogus", "chat3", "https://z/3"),
+    ])
+    tracker = FakeTracker()
+
+    assert TrackerEventConsumer(persist, tracker, batch_size=2).drain() == 4
+
+    assert persist.claims == [2, 2, 2]
+    assert tracker.calls == [
+        ("subscribe", "chat1", "https://z/1", ["M"], PRIORITY_HIGH),
+        ("subscribe", "chat2", "https://z/2", None, PRIORITY_NORMAL),
+        ("unsubscribe", "chat1", "https://z/1"),
+    ]
+
+
+class FakeListenConn:
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.notifies = []
+        self.closed = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def poll(self):
+        self.sock.recv(1024)
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        self.peer.close()
+
+
+def test_stop_wakes_an_idle_consumer():
+    persist = FakePersist()
+    conn = FakeListenConn()
+    persist.listen = lambda: conn
+    consumer = TrackerEventConsumer(persist, FakeTracker(), idle_timeout=30)
+    thread = threading.Thread(target=consumer.run_forever)
+    thread.start()
+    assert wait_for_claims(persist)
+
+    consumer.stop()
+    thread.join(timeout=1)
+
+    assert not thread.is_alive()
+    assert conn.closed
+
+
+def wait_for_claims(persist, timeout=1.0):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if persist.claims:
+            return True
+        event.wait(0.01)
+    return False
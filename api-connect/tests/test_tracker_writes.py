@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+from tracker_writes import TrackerWrites
+
+
+class FakePersist:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def apply_tracker_writes(self, removals, seen, errors):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append((list(removals), dict(seen), dict(errors)))
+        return len(removals)
+
+
+T0 = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def test_cycle_is_written_as_one_batch():
+    persist = FakePersist()
+    writes = TrackerWrites(persist)
+
+    for n in range(1000):
+        writes.remove(f"chat{n}", "https://z/a")
+    writes.seen("https://z/a", T0)
+    writes.error("https://z/b")
+    writes.error("https://z/b")
+
+    assert writes.flush() == 1002
+    assert len(persist.batches) == 1
+    removals, seen, errors = persist.batches[0]
+    assert len(removals) == 1000
+    assert seen == {"https://z/a": T0}
+    assert errors == {"https://z/b": 2}
+    assert writes.flush() == 0
+
+
+def test_success_resets_error_count_and_keep_cancels_removal():
+    persist = FakePersist()
+    writes = TrackerWrites(persist)
+
+    writes.error("https://z/a")
+    writes.seen("https://z/a", T0)
+    writes.error("https://z/a")
+    writes.remove("chat1", "https://z/a")
+    writes.keep("chat1", "https://z/a")
+    writes.flush()
+
+    assert persist.batches == [([], {"https://z/a": T0}, {"https://z/a": 1})]
+
+
+def test_failed_flush_is_retried_without_losing_newer_state():
+    persist = FakePersist(fail=True)
+    writes = TrackerWrites(persist)
+    writes.remove("chat1", "https://z/a")
+    writes.seen("https://z/a", T0)
+    writes.error("https://z/b")
+
+    assert writes.flush() == 0
+    writes.seen("https://z/b", T0 + timedelta(seconds=5))  # b recovered meanwhile
+    persist.fail = False
+
+    assert writes.flush() == 3
+    assert persist.batches == [(
+        [("chat1", "https://z/a")],
+        {"https://z/a": T0, "https://z/b": T0 + timedelta(seconds=5)},
+        {},
+    )]
@@ -1,5 +1,5 @@
 import pytest
-from zara.util import parse_zara_url, map_sizes_to_bools
+from zara.util import parse_zara_url, map_sizes_to_bools, extract_view_payload_script
 
 @pytest.mark.parametrize("url,product,v1", [
     ('https://www.zara.com/share/straight-blazer-zw-collection-p08771510.html?v1=402153953&v2=2420942&utm_campaign=productShare&utm_medium=mobile_sharing_iOS&utm_source=red_social_movil', 'straight-blazer-zw-collection-p08771510', '402153953'), 
@@ -62,4 +62,27 @@ def test_mapping_3():
     assert result['M'] == False
     assert result['L'] == True
     assert result['XL'] == False
-    assert result['XXL'] == False        
\ No newline at end of file
+    assert result['XXL'] == False        
+
+PAGE = (
+    '<html><head><script>window.zara = {};</script></head><body>'
+    '<script>window.zara.appConfig = {"a": 1};window.zara.viewPayload = {"product": {"name": "</scrip"}};</script>'
+    '<script>window.zara.viewPayload = {"other": true};</script>'
+    + 'x' * 1000 + '</body></html>'
+)
+PAYLOAD = 'window.zara.viewPayload = {"product": {"name": "</scrip"}};'
+
+def chunked(text, size, consumed):
+    for i in range(0, len(text), size):
+        consumed.append(size)
+        yield text[i:i + size]
+
+@pytest.mark.parametrize("size", [1, 2, 7, 9, 26, 64, 10000])
+def test_extract_view_payload_script(size):
+    consumed = []
+    assert extract_view_payload_script(chunked(PAGE, size, consumed)) == PAYLOAD
+    # Reading stops at the payload's closing tag; the rest of the page is never pulled.
+    assert sum(consumed) < len(PAGE) or size >= len(PAGE)
+
+def test_extract_view_payload_script_missing():
+    assert extract_view_payload_script(chunked('<html><script>var a = 1;</script></html>', 5, [])) is None
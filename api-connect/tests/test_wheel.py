@@ -0,0 +1,71 @@
+from wheel import TimingWheel
+
+
+def test_pop_due_in_deadline_order():
+    wheel = TimingWheel(tick=1, size=8, start=0)
+    wheel.schedule("b", 2.5)
+    wheel.schedule("a", 1.2)
+    wheel.schedule("c", 5.0)
+
+    assert wheel.pop_due(0.5) == []
+    assert wheel.pop_due(2.9) == [("a", 1.2), ("b", 2.5)]
+    assert len(wheel) == 1 and "c" in wheel
+
+
+def test_cancel_and_reschedule():
+    wheel = TimingWheel(tick=1, size=8, start=0)
+    wheel.schedule("a", 1)
+    wheel.schedule("b", 1)
+    assert wheel.cancel("a") is True
+    assert wheel.cancel("a") is False
+
+    wheel.schedule("b", 4)  # replaces the earlier deadline
+    assert wheel.pop_due(2) == []
+    assert wheel.deadline("b") == 4
+    assert wheel.pop_due(4) == [("b", 4)]
+
+
+def test_deadlines_beyond_one_revolution():
+    wheel = TimingWheel(tick=1, size=4, start=0)
+    wheel.schedule("far", 9)
+    wheel.schedule("near", 1)
+
+    assert wheel.pop_due(5) == [("near", 1)]
+    assert "far" in wheel
+    assert wheel.pop_due(9) == [("far", 9)]
+
+
+def test_past_deadlines_are_due_on_the_next_tick():
+    wheel = TimingWheel(tick=1, size=4, start=0)
+    wheel.pop_due(10)
+    wheel.schedule("late", 3)
+    assert wheel.pop_due(11) == [("late", 3)]
+
+
+def test_batches_respect_limit():
+    wheel = TimingWheel(tick=1, size=16, start=0)
+    for i in range(10):
+        wheel.schedule(i, i % 3)
+
+    batches = []
+    while True:
+        batch = wheel.pop_due(5, limit=4)
+        if not batch:
+            break
+        batches.append(batch)
+
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert sorted(key for batch in batches for key, _ in batch) == list(range(10))
+    assert len(wheel) == 0
+
+
+def test_many_entries():
+    wheel = TimingWheel(tick=0.25, size=1024, start=0)
+    for i in range(100_000):
+        wheel.schedule(i, (i % 20) * 0.25)
+    for i in range(0, 100_000, 2):
+        wheel.cancel(i)
+
+    due = wheel.pop_due(10)
+    assert len(due) == 50_000
+    assert len(wheel) == 0
@@ -1,70 +1,286 @@
+from apscheduler.executors.pool import ThreadPoolExecutor as HousekeepingExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from zara.util import parse_zara_url, map_sizes_to_bools
 from zara.api import get_product, get_stock
+from zara import cache as product_cache
+from zara import client as zara_client
 from persist import Persist
+from history import AvailabilityHistory
+from tracker_writes import TrackerWrites
+from load import LoadMonitor, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from fair import FairQueue
+from wheel import TimingWheel
 import logging
+import os
+import threading
+import time
 import requests
-from requests import Response
 baseUrl = 'http://telegram-bot:3000/event'
 
+POLL_INTERVAL_SECONDS = float(os.getenv('TRACKER_INTERVAL_SECONDS', 5))
+# Bounded pool for the fetch stage: at most this many products are polled at once.
+TRACKER_WORKERS = int(os.getenv('TRACKER_WORKERS', 20))
+# How many due products the dispatcher takes from the wheel at a time.
+DISPATCH_BATCH = int(os.getenv('TRACKER_DISPATCH_BATCH', 256))
+WHEEL_TICK_SECONDS = float(os.getenv('TRACKER_WHEEL_TICK_SECONDS', 0.25))
+# Most polls a single chat may have running at once; 0 disables the cap.
+CHAT_QUOTA = int(os.getenv('TRACKER_CHAT_QUOTA', max(1, TRACKER_WORKERS // 4)))
+# Share of fetch capacity a chat gets relative to others, by subscription priority.
+CHAT_WEIGHTS = {PRIORITY_HIGH: 4.0, PRIORITY_NORMAL: 2.0, PRIORITY_LOW: 1.0}
+# A cached product is re-scraped when availability reports a SKU not seen since its
+# last scrape, but at most this often per product.
+UNKNOWN_SKU_RECHECK_SECONDS = float(os.getenv('TRACKER_UNKNOWN_SKU_RECHECK_SECONDS', 300))
+# Smoothed start lag above which the tracker starts stretching low-priority intervals.
+LAG_THRESHOLD_SECONDS = float(os.getenv('TRACKER_LAG_THRESHOLD_SECONDS', 2))
+# A slow bot must not hold a fetch worker; the chat is notified again next cycle.
+NOTIFY_TIMEOUT_SECONDS = float(os.getenv('TRACKER_NOTIFY_TIMEOUT_SECONDS', 5))
+
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 
+
+class PollEntry:
+    """One polled product and the chats waiting on it."""
+    __slots__ = ('url', 'subscribers', 'queued')
+
+    def __init__(self, url):
+        self.url = url
+        self.subscribers = {}  # chat_id -> (selected_sizes, priority)
+        # True from the moment the entry leaves the wheel until its poll finishes.
+        self.queued = False
+
+    @property
+    def priority(self):
+        # A product is as important as its most important subscriber.
+        return min(priority for _sizes, priority in self.subscribers.values())
+
+
 class Tracker:
-    def __init__(self, persist) -> None:
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+    """
+    Polls subscribed products and notifies chats when a selected size is in stock.
+
+    Subscriptions are grouped per product URL, and each product sits in a
+    TimingWheel until its next poll is due. A dispatcher thread moves due
+    products from the wheel into a FairQueue keyed by chat and runs them on a
+    bounded fetch pool, so a chat following hundreds of products cannot starve
+    one following a few. Once a poll finishes the product goes back into the
+    wheel one interval later (stretched under load). APScheduler only runs
+    housekeeping. Database writes from polls (subscription removals, last seen,
+    error counts) are batched per cycle by TrackerWrites.
+    """
+
+    def __init__(self, persist, history=None, writes=None) -> None:
         self.persist: Persist = persist
+        self.history: AvailabilityHistory = history or AvailabilityHistory(persist)
+        self.writes: TrackerWrites = writes or TrackerWrites(persist)
+        self.load = LoadMonitor(lag_threshold=LAG_THRESHOLD_SECONDS)
+        self.wheel = TimingWheel(tick=WHEEL_TICK_SECONDS)
+        self._entries = {}  # url -> PollEntry
+        self._queue = FairQueue(quota=CHAT_QUOTA or None)  # due products waiting for a worker
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._capacity = threading.BoundedSemaphore(TRACKER_WORKERS)
+        self._pool = ThreadPoolExecutor(max_workers=TRACKER_WORKERS, thread_name_prefix='tracker-fetch')
+
+        self.history.start()
+        self.writes.start()
+        self.scheduler = BackgroundScheduler(executors={'default': HousekeepingExecutor(max_workers=1)})
+        self.scheduler.start()
+        self.scheduler.add_job(
+            func=self.history.compact,
+            trigger='interval',
+            hours=24,
+            # Interval jobs first fire one interval after start; deploys restart
+            # the tracker more often than that, so also run once right away.
+            next_run_time=datetime.now(timezone.utc),
+            id='history_compact',
+            replace_existing=True
+        )
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='tracker-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=True)
+        self.scheduler.shutdown()
+        self.history.stop()
+        self.writes.stop()
+
+    def stats(self):
+        with self._lock:
+            products = len(self._entries)
+            subscriptions = sum(len(entry.subscribers) for entry in self._entries.values())
+            waiting = len(self._queue)
+            chats_waiting = len(self._queue.backlog())
+        return {
+            'products': products,
+            'subscriptions': subscriptions,
+            'waiting_for_worker': waiting,
+            'chats_waiting': chats_waiting,
+            'chat_quota': CHAT_QUOTA,
+            'workers': TRACKER_WORKERS,
+            'interval_seconds': POLL_INTERVAL_SECONDS,
+            'load': self.load.stats(),
+            'pending_writes': self.writes.pending(),
+            'product_cache': self._cache_stats(),
+            'zara': zara_client.stats(),
+        }
+
+    @staticmethod
+    def _cache_stats():
+        cache = product_cache.get_cache()
+        return None if cache is None else cache.stats()
 
-    def get_zara(self, chat_id, url, selected_sizes=None):
-        logging.info(f'Checking {url} for {chat_id}')
+    def _interval_for(self, priority):
+        return POLL_INTERVAL_SECONDS * self.load.stretch(priority)
+
+    @staticmethod
+    def _owners(entry):
+        return {chat_id: CHAT_WEIGHTS[priority] for chat_id, (_sizes, priority) in entry.subscribers.items()}
+
+    def _dispatch_loop(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                now = time.monotonic()
+                # Everything due enters the fair queue, so fairness decides the order
+                # rather than whichever chat's products happened to fall due first.
+                while True:
+                    due = self.wheel.pop_due(now, limit=DISPATCH_BATCH)
+                    for url, deadline in due:
+                        entry = self._entries[url]
+                        entry.queued = True
+                        self._queue.push(url, (entry, deadline), self._owners(entry))
+                    if len(due) < DISPATCH_BATCH:
+                        break
+                while self._capacity.acquire(blocking=False):
+                    popped = self._queue.pop()
+                    if popped is None:
+                        self._capacity.release()
+                        break
+                    _url, (entry, deadline), owners = popped
+                    if not entry.subscribers:
+                        entry.queued = False  # everyone unsubscribed while it waited
+                        self._queue.done(owners)
+                        self._capacity.release()
+                        continue
+                    self._pool.submit(self._run_poll, entry, deadline, owners, time.monotonic())
+            # Woken early when a poll finishes and frees a worker.
+            self._wakeup.wait(WHEEL_TICK_SECONDS)
+            self._wakeup.clear()
+
+    def _run_poll(self, entry, deadline, owners, dispatched):
+        try:
+            self.poll(entry)
+        except Exception:
+            logging.exception(f'Polling {entry.url} failed')
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                entry.queued = False
+                self._queue.done(owners)
+                if self._entries.get(entry.url) is entry and entry.subscribers:
+                    self.wheel.schedule(entry.url, finished + self._interval_for(entry.priority))
+            self._capacity.release()
+            self._wakeup.set()
+            self.load.observe(dispatched - deadline, finished - dispatched, POLL_INTERVAL_SECONDS)
+
+    def poll(self, entry):
+        url = entry.url
+        with self._lock:
+            subscribers = dict(entry.subscribers)
+        logging.info(f'Checking {url} for {list(subscribers)}')
         parsed = parse_zara_url(url)
         try:
             product = get_product(parsed['product'], parsed['v1'])
             stock = get_stock(product.productId)
-            sizes = map_sizes_to_bools(product.sizes, stock)
-            selected_sizes = selected_sizes if selected_sizes is not None else self.persist.get_selected_sizes(chat_id, url)
-            logging.info({
-                "url": product.url,
-                "name": product.name,
-                "productId": product.productId,
-                "sizes": sizes,
-                "v1": product.v1
-            })
-            sizes_to_check = sizes
-            if selected_sizes:
-                sizes_to_check = {k: v for (k, v) in sizes.items() if k in selected_sizes}
-
-            if sizes_to_check and any(sizes_to_check.values()):
-                message = f'{url}\n{product.name}\n'
-                for size in sizes_to_check.keys():
-                    message += f"{size}: {'In stock' if sizes_to_check[size] else 'Not in stock'}\n"
-                response: Response = requests.post(
-                url=baseUrl, 
-                json={"userId": chat_id, "message": message},
-                headers={"Content-Type": "application/json"})
-                self.persist.remove_product(chat_id, url)    
-                self.scheduler.remove_job(f'get_zara_{chat_id}_{url}')
-        except:
+        except Exception:
             logging.warning('No product on url ' + url)
-            response: Response = requests.post(
-                url=baseUrl, 
-                json={"userId": chat_id, "message": f'This product does not exist. TODO: Use check on tgbot\n{response.text}'},
-                headers={"Content-Type": "application/json"})
-            logging.info(response.status_code)
-            logging.info(response.text)
-            #self.persist.remove_product(chat_id, url)    
-            #self.scheduler.remove_job(f'get_zara_{url}')
-
-                
-    def subscribe(self, chat_id, url, selected_sizes=None):
-        logging.info(f'Subscribing to {url} sizes={selected_sizes}')
-        self.scheduler.add_job(
-            func=self.get_zara,
-            trigger='interval',
-            seconds=5,
-            args=[chat_id, url, selected_sizes],
-            id=f'get_zara_{chat_id}_{url}',
-            replace_existing=True
-        )
+            self.load.count('fetch_errors')
+            self.writes.error(url)
+            return
+        self.writes.seen(url)
+        if any(sku not in product.sizes for sku, _in_stock in stock):
+            product = self._refresh_product(parsed, product, stock)
+        self.history.record(product.productId, stock)
+        sizes = map_sizes_to_bools(product.sizes, stock)
+        logging.info({
+            "url": product.url,
+            "name": product.name,
+            "productId": product.productId,
+            "sizes": sizes,
+            "v1": product.v1
+        })
+        for chat_id, (selected_sizes, _priority) in subscribers.items():
+            try:
+                self.check_sizes(chat_id, url, product, sizes, selected_sizes)
+            except Exception:
+                # The subscription stays, so the next poll tries this chat again.
+                logging.exception(f'Notifying {chat_id} about {url} failed')
+
+    def _refresh_product(self, parsed, product, stock):
+        # New sizes would otherwise be dropped by map_sizes_to_bools until the cache
+        # expires. Availability routinely lists SKUs of other colours, which the size
+        # map never has, so only SKUs not seen since the last scrape trigger one.
+        cache = product_cache.get_cache()
+        if cache is None:
+            return product
+        skus = {sku for sku, _in_stock in stock}
+        known = cache.known_skus(parsed['product'], parsed['v1'])
+        if known is None:
+            cache.remember_skus(parsed['product'], parsed['v1'], skus)
+            return product
+        if skus <= known or not cache.invalidate(parsed['product'], parsed['v1'], min_age=UNKNOWN_SKU_RECHECK_SECONDS):
+            return product
+        logging.info(f'New SKU for {product.url}, refreshing cached product')
+        try:
+            product = get_product(parsed['product'], parsed['v1'])
+        except Exception:
+            logging.warning('Refreshing product failed for ' + product.url)
+            return product
+        cache.remember_skus(parsed['product'], parsed['v1'], skus)
+        return product
+
+    def check_sizes(self, chat_id, url, product, sizes, selected_sizes=None):
+        selected_sizes = selected_sizes if selected_sizes is not None else self.persist.get_selected_sizes(chat_id, url)
+        sizes_to_check = sizes
+        if selected_sizes:
+            sizes_to_check = {k: v for (k, v) in sizes.items() if k in selected_sizes}
+
+        if sizes_to_check and any(sizes_to_check.values()):
+            message = f'{url}\n{product.name}\n'
+            for size in sizes_to_check.keys():
+                message += f"{size}: {'In stock' if sizes_to_check[size] else 'Not in stock'}\n"
+            requests.post(
+                url=baseUrl,
+                json={"userId": chat_id, "message": message},
+                headers={"Content-Type": "application/json"},
+                timeout=NOTIFY_TIMEOUT_SECONDS)
+            self.writes.remove(chat_id, url)
+            self.unsubscribe(chat_id, url)
+
+    def subscribe(self, chat_id, url, selected_sizes=None, priority=PRIORITY_NORMAL):
+        logging.info(f'Subscribing to {url} sizes={selected_sizes} priority={priority}')
+        self.writes.keep(chat_id, url)
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                entry = self._entries[url] = PollEntry(url)
+            entry.subscribers[chat_id] = (selected_sizes, priority)
+            if not entry.queued and url not in self.wheel:
+                self.wheel.schedule(url, time.monotonic() + self._interval_for(priority))
 
-    
+    def unsubscribe(self, chat_id, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry.subscribers.pop(chat_id, None) is None:
+                return
+            if not entry.subscribers:
+                del self._entries[url]
+                self.wheel.cancel(url)
+                # Otherwise a resubscribed entry's push is dropped as a duplicate.
+                self._queue.discard(url)
+        logging.info(f'Unsubscribed {chat_id} from {url}')
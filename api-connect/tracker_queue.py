@@ -0,0 +1,94 @@
+import logging
+import os
+import select
+import threading
+
+from load import PRIORITY_NORMAL
+from persist import Persist
+from zara import cache as product_cache
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedTracker:
+    """
+    Stand-in for Tracker in web processes when polling runs in a separate worker
+    (TRACKER_MODE=external). Subscription changes are written to the
+    tracker_events queue instead of being scheduled in-process.
+    """
+
+    def __init__(self, persist: Persist):
+        self.persist = persist
+
+    def subscribe(self, chat_id, url, selected_sizes=None, priority=PRIORITY_NORMAL):
+        self.persist.enqueue_tracker_event('subscribe', chat_id, url, selected_sizes, priority)
+
+    def unsubscribe(self, chat_id, url):
+        self.persist.enqueue_tracker_event('unsubscribe', chat_id, url)
+
+    def stats(self):
+        cache = product_cache.get_cache()
+        return {
+            'mode': 'external',
+            'pending_events': self.persist.count_tracker_events(),
+            # Lookups made by this web worker; entries are shared host-wide.
+            'product_cache': None if cache is None else cache.stats(),
+        }
+
+
+class TrackerEventConsumer:
+    """
+    Applies queued subscription changes to a Tracker. Runs in the tracker worker:
+    drains the queue, then sleeps on LISTEN until a NOTIFY (or the timeout, as a
+    safety net for missed notifications) says there is more. stop() wakes that
+    sleep through a self-pipe, so it is safe to call from a signal handler.
+    """
+
+    def __init__(self, persist: Persist, tracker, batch_size: int = 500, idle_timeout: float = 30.0):
+        self.persist = persist
+        self.tracker = tracker
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self._stopped = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+
+    def drain(self) -> int:
+        applied = 0
+        while True:
+            events = self.persist.claim_tracker_events(self.batch_size)
+            for event in events:
+                self.apply(event)
+            applied += len(events)
+            if len(events) < self.batch_size:
+                return applied
+
+    def apply(self, event):
+        if event['kind'] == 'subscribe':
+            priority = PRIORITY_NORMAL if event['priority'] is None else event['priority']
+            self.tracker.subscribe(event['chat_id'], event['url'], event['selected_sizes'], priority=priority)
+        elif event['kind'] == 'unsubscribe':
+            self.tracker.unsubscribe(event['chat_id'], event['url'])
+        else:
+            logger.warning('Ignoring unknown tracker event %s', event)
+
+    def stop(self):
+        self._stopped.set()
+        try:
+            os.write(self._wake_write, b'\0')
+        except BlockingIOError:
+            pass  # a wakeup is already pending
+
+    def run_forever(self):
+        conn = self.persist.listen()
+        try:
+            while not self._stopped.is_set():
+                applied = self.drain()
+                if applied:
+                    logger.info('Applied %s tracker events', applied)
+                readable, _, _ = select.select([conn, self._wake_read], [], [], self.idle_timeout)
+                if conn in readable:
+                    conn.poll()
+                    conn.notifies.clear()
+        finally:
+            conn.close()
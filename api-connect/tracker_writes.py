@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from persist import Persist
+
+logger = logging.getLogger(__name__)
+
+
+class TrackerWrites:
+    """
+    Database work produced by polling, collected per write cycle.
+
+    Polls only touch memory: subscriptions to remove after a restock
+    notification, when each product was last fetched successfully, and how
+    many fetches failed since. A background thread hands everything gathered
+    during the cycle to Persist.apply_tracker_writes, which applies it in one
+    transaction with array parameters, so a restock that notifies thousands of
+    chats costs a handful of round trips instead of one connection per chat.
+    """
+
+    def __init__(self, persist: Persist, flush_interval: Optional[float] = None, flush_size: Optional[int] = None):
+        self.persist = persist
+        self.flush_interval = flush_interval or float(os.getenv('TRACKER_WRITE_INTERVAL_SECONDS', 1))
+        self.flush_size = flush_size or int(os.getenv('TRACKER_WRITE_FLUSH_SIZE', 1000))
+
+        self._removals: Set[Tuple[str, str]] = set()
+        self._seen: Dict[str, datetime] = {}
+        self._errors: Counter = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='tracker-writes', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def remove(self, chat_id: str, url: str):
+        with self._lock:
+            self._removals.add((chat_id, url))
+            pending = len(self._removals)
+        if pending >= self.flush_size:
+            self._wakeup.set()
+
+    def keep(self, chat_id: str, url: str):
+        """Cancel a removal not yet written, e.g. when the chat follows the product again."""
+        with self._lock:
+            self._removals.discard((chat_id, url))
+
+    def seen(self, url: str, observed_at: Optional[datetime] = None):
+        with self._lock:
+            self._seen[url] = observed_at or datetime.now(timezone.utc)
+            # error_count counts failures since the last successful fetch.
+            self._errors.pop(url, None)
+
+    def error(self, url: str):
+        with self._lock:
+            self._errors[url] += 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._removals) + len(self._seen) + len(self._errors)
+
+    def flush(self) -> int:
+        """Write everything collected so far; on failure it is merged back for the next cycle."""
+        with self._lock:
+            removals, self._removals = self._removals, set()
+            seen, self._seen = self._seen, {}
+            errors, self._errors = self._errors, Counter()
+        if not (removals or seen or errors):
+            return 0
+        try:
+            self.persist.apply_tracker_writes(sorted(removals), seen, dict(errors))
+        except Exception:
+            logger.exception('Failed to write %s removals, %s last-seen and %s error updates',
+                             len(removals), len(seen), len(errors))
+            with self._lock:
+                self._removals |= removals
+                # A success recorded since supersedes the failed batch's state for that URL.
+                newer = set(self._seen)
+                for url, observed_at in seen.items():
+                    self._seen.setdefault(url, observed_at)
+                for url, count in errors.items():
+                    if url not in newer:
+                        self._errors[url] += count
+            return 0
+        self.flushes += 1
+        return len(removals) + len(seen) + len(errors)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
@@ -0,0 +1,80 @@
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel: `size` slots of `tick` seconds each, keyed by an
+    arbitrary hashable (the tracker uses product URLs).
+
+    schedule() and cancel() are O(1): a key lives in exactly one slot dict and
+    `_where` remembers which. Deadlines further out than one revolution simply
+    stay in their slot until the cursor comes round again, so there is no
+    upper bound on delays. pop_due() walks the slots the cursor has passed and
+    hands expired keys out in batches of at most `limit`.
+    """
+
+    def __init__(self, tick: float = 0.25, size: int = 1024, start: Optional[float] = None):
+        self.tick = tick
+        self.size = size
+        self._origin = time.monotonic() if start is None else start
+        self._slots: List[Dict[Hashable, float]] = [dict() for _ in range(size)]
+        self._where: Dict[Hashable, int] = {}
+        self._cursor = 0  # absolute tick of the next slot to inspect
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def _tick_of(self, when: float) -> int:
+        return int((when - self._origin) // self.tick)
+
+    def schedule(self, key: Hashable, when: float):
+        """Schedule key at monotonic time `when`, replacing any earlier deadline."""
+        self.cancel(key)
+        index = max(self._tick_of(when), self._cursor) % self.size
+        self._slots[index][key] = when
+        self._where[key] = index
+
+    def cancel(self, key: Hashable) -> bool:
+        index = self._where.pop(key, None)
+        if index is None:
+            return False
+        del self._slots[index][key]
+        return True
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        index = self._where.get(key)
+        return None if index is None else self._slots[index][key]
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Remove and return up to `limit` (key, deadline) pairs whose deadline
+        tick has been reached by `now`, oldest slots first.
+        """
+        target = self._tick_of(now)
+        due: List[Tuple[Hashable, float]] = []
+        if not self._where:
+            self._cursor = max(self._cursor, target + 1)
+            return due
+        while self._cursor <= target:
+            slot = self._slots[self._cursor % self.size]
+            room = None if limit is None else limit - len(due)
+            expired = []
+            for key, when in slot.items():
+                if self._tick_of(when) > self._cursor:
+                    continue  # a later revolution
+                expired.append((key, when))
+                if room is not None and len(expired) >= room:
+                    break
+            for key, when in expired:
+                del slot[key]
+                del self._where[key]
+            due.extend(expired)
+            if limit is not None and len(due) >= limit:
+                # Leave the cursor here; the slot may still hold due keys.
+                return due
+            self._cursor += 1
+        return due
@@ -0,0 +1,35 @@
+from persist import Persist
+from tracker import Tracker
+from tracker_queue import TrackerEventConsumer
+import logging
+import signal
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+
+def main():
+    """
+    Standalone tracker process for TRACKER_MODE=external deployments: loads every
+    stored subscription, then follows the tracker_events queue written by the API.
+    """
+    persist = Persist()
+    tracker = Tracker(persist)
+    subscriptions = persist.get_all_subscriptions()
+    for chat_id, url, selected_sizes, priority in subscriptions:
+        tracker.subscribe(chat_id, url, selected_sizes, priority=priority)
+    logging.info(f'Tracker worker started with {len(subscriptions)} subscriptions')
+
+    consumer = TrackerEventConsumer(persist, tracker)
+    # Wakes the consumer immediately so tracker.stop() can flush pending writes
+    # well within the container's stop grace period.
+    signal.signal(signal.SIGTERM, lambda *_: consumer.stop())
+    try:
+        consumer.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracker.stop()
+
+
+if __name__ == '__main__':
+    main()
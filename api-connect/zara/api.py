@@ -1,20 +1,42 @@
+import codecs
 import json
 import sys
-from typing import Any, List, Tuple
+from typing import Any, Iterator, List, Optional, Tuple
 import requests
+from zara import cache as product_cache
+from zara import client
+from zara.payload import extract_product, sizes_by_sku
 from zara.product import Product
-from bs4 import BeautifulSoup
+from zara.util import VIEW_PAYLOAD_TOKEN, extract_view_payload_script
+
+# Size of each read from the final product page response.
+PAGE_CHUNK_SIZE = 16 * 1024
 
 def get_product(product: str, v1: str) -> Product:
+    # Metadata is shared through the host-wide cache; only a miss scrapes the page.
+    cache = product_cache.get_cache()
+    if cache is not None:
+        cached = cache.get(product, v1)
+        if cached is not None:
+            return cached
     url = f'https://www.zara.com/nl/en/{product}.html?v1={v1}'
-    product_json = get_product_json(url)
-    name: str = product_json['product']['name']
-    productId: int = product_json['product']['detail']['colors'][0]['productId']
-    sizes: dict[str, int] = {}
-    for size in product_json['product']['detail']['colors'][0]['sizes']:
-        # Normalize SKU keys as ints so they match availability payloads.
-        sizes[int(size['sku'])] = size['name']
-    return Product(url, productId, name, sizes, v1)
+    # Only product.name and the first colour's productId/sizes are decoded;
+    # the rest of the (large) viewPayload is skipped.
+    fields = extract_product(get_view_payload(url))
+    result = Product(url, fields['productId'], fields['name'], sizes_by_sku(fields['sizes']), v1)
+    if cache is not None:
+        cache.put(product, v1, result)
+    return result
+
+def get_view_payload(url: str) -> Optional[str]:
+    """Raw JSON text of the page's window.zara.viewPayload, or None if absent."""
+    script = fetch_zara_product_page(url)
+    if script is None:
+        return None
+    payload = script[len(VIEW_PAYLOAD_TOKEN):].rstrip()
+    if payload.endswith(';'):
+        payload = payload[:-1]
+    return payload
 
 def get_product_json(url: str) -> Any:
     headers = {
@@ -32,25 +54,26 @@ def get_product_json(url: str) -> Any:
         "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36",
     }
     # TODO: Test the string for validity
+    payload = get_view_payload(url)
+    return None if payload is None else json.loads(payload)
+
+def _decoded_chunks(response) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    for chunk in response.iter_content(chunk_size=PAGE_CHUNK_SIZE):
+        client.incr('page.bytes_read', len(chunk))
+        yield decoder.decode(chunk)
 
-    response = fetch_zara_product_page(url)
-    soup = BeautifulSoup(response, 'html.parser')
-    scripts = soup.find_all('script')
-    for script in scripts:
-        begin_token = 'window.zara.viewPayload = '
-        if begin_token in script.text:
-            index = script.text.find(begin_token)
-            product_json = json.loads(script.text[index + len(begin_token):-1])
-            return product_json     
-
-def fetch_zara_product_page(product_url: str) -> str:
+def fetch_zara_product_page(product_url: str) -> Optional[str]:
     """
-    Fetch the HTML of a Zara product page by mimicking the browser’s
+    Fetch the viewPayload script of a Zara product page by mimicking the browser’s
     four-step sequence of requests.  Steps:
       1. Initial GET to the product page (no cookies).
       2. GET to the interstitial page.
       3. POST to the verification endpoint.
       4. Final GET to the product page (cookies now included automatically).
+    The final page is streamed and the connection closed as soon as the
+    script holding `window.zara.viewPayload` has been read, so the rest of the
+    page is never downloaded. Returns None if the page has no such script.
     """
 
     session = requests.Session()
@@ -84,7 +107,7 @@ def fetch_zara_product_page(product_url: str) -> str:
         "sec-fetch-site": "none",
         "sec-fetch-user": "?1",
     }
-    resp1 = session.get(product_url, headers=init_headers)
+    resp1 = client.request(session, 'GET', product_url, 'page', headers=init_headers)
     resp1.raise_for_status()
 
     # Step 2: GET the interstitial page.
@@ -96,7 +119,7 @@ def fetch_zara_product_page(product_url: str) -> str:
         "sec-fetch-site": "same-origin",
         "referer": product_url,
     }
-    resp2 = session.get(interstitial_url, headers=interstitial_headers)
+    resp2 = client.request(session, 'GET', interstitial_url, 'page', headers=interstitial_headers)
     resp2.raise_for_status()
 
     # Step 3: POST the verification challenge.
@@ -127,9 +150,9 @@ def fetch_zara_product_page(product_url: str) -> str:
         "referer": product_url,
         "user-agent": base_headers["user-agent"],
     }
-    resp3 = session.post(verify_url,
-                         headers=verify_headers,
-                         data=json.dumps(verify_payload))
+    resp3 = client.request(session, 'POST', verify_url, 'verify',
+                           headers=verify_headers,
+                           data=json.dumps(verify_payload))
     resp3.raise_for_status()
 
     # Step 4: Final GET to the product page with cookies set.
@@ -141,10 +164,13 @@ def fetch_zara_product_page(product_url: str) -> str:
         # no 'sec-fetch-user' needed here (matches your final call)
         "referer": product_url,
     }
-    resp4 = session.get(product_url, headers=final_headers)
-    resp4.raise_for_status()
-
-    return resp4.text
+    resp4 = client.request(session, 'GET', product_url, 'page', headers=final_headers, stream=True)
+    try:
+        resp4.raise_for_status()
+        return extract_view_payload_script(_decoded_chunks(resp4))
+    finally:
+        # Closing mid-body drops the connection instead of draining the rest of the page.
+        resp4.close()
 
 def is_size_in_stock(productId: int, sku: int) -> bool:
     stock = get_stock(productId)
@@ -172,10 +198,9 @@ def get_stock(productId: int) -> List[Tuple[int, bool]]:
     }
     url = f'https://www.zara.com/itxrest/1/catalog/store/11709/product/id/{productId}/availability'
     print('Availability URL ' + url)
-    try:
-        response = requests.get(url, headers=headers)
-    except:
-        print('Something happened in request')
+    # Timeouts, retries and (optional) hedging live in zara.client; a failure
+    # after the retry budget is spent propagates to the caller.
+    response = client.hedged_get(url, 'availability', headers=headers)
     print('Response status' + str(response.status_code))
     if response.status_code == 200:
         result = json.loads(response.text)
@@ -0,0 +1,211 @@
+"""
+Product metadata cache shared by every process on a host.
+
+get_product() scrapes a product page (several seconds) to learn a product's
+name, productId and SKU -> size map, which rarely change. Entries are keyed by
+(product, v1) and kept in a small SQLite file, so the API's web workers and
+the tracker worker on one host all reuse each other's lookups. Entries expire
+after a TTL, and the least recently used ones are evicted beyond a size bound.
+Availability often lists SKUs outside the size map (get_product() reads only
+the first colour), so the tracker records the availability SKUs it sees right
+after each scrape, and invalidates an entry only when a SKU shows up that is in
+neither the size map nor that recorded set.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Set
+
+from zara.product import Product
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CACHE_PATH = os.getenv('PRODUCT_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'shppd-product-cache.sqlite3'))
+PRODUCT_CACHE_TTL_SECONDS = float(os.getenv('PRODUCT_CACHE_TTL_SECONDS', 3600))
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', 10000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product TEXT NOT NULL,
+    v1 TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (product, v1)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS products_accessed_idx ON products (accessed_at);
+"""
+
+
+class ProductCache:
+    """
+    TTL + LRU cache of Product objects in a SQLite file. Safe to use from many
+    threads (one connection each) and many processes (SQLite file locking).
+    A cache error is logged and treated as a miss; it never fails a lookup.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.counters: Counter = Counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # WAL lets readers in other processes proceed while one process writes;
+            # durability does not matter for a cache.
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _incr(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, product: str, v1: str) -> Optional[Product]:
+        now = self.clock()
+        try:
+            # One statement both checks freshness and refreshes the LRU position.
+            rows = self._conn().execute(
+                'UPDATE products SET accessed_at = ? WHERE product = ? AND v1 = ? AND expires_at > ? RETURNING value',
+                (now, product, v1, now),
+            ).fetchall()
+        except sqlite3.Error:
+            logger.exception('Product cache read failed')
+            self._incr('errors')
+            rows = []
+        if not rows:
+            self._incr('misses')
+            return None
+        self._incr('hits')
+        value = json.loads(rows[0][0])
+        # JSON object keys are strings; SKUs are ints everywhere else.
+        sizes = {int(sku): name for sku, name in value['sizes'].items()}
+        return Product(value['url'], value['productId'], value['name'], sizes, value['v1'])
+
+    def put(self, product: str, v1: str, value: Product):
+        now = self.clock()
+        encoded = json.dumps({
+            'url': value.url,
+            'productId': value.productId,
+            'name': value.name,
+            'sizes': value.sizes,
+            'v1': value.v1,
+        })
+        try:
+            conn = self._conn()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO products (product, v1, value, stored_at, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (product, v1, encoded, now, now + self.ttl, now),
+            )
+            # Expired entries go first, then the least recently used beyond the bound.
+            conn.execute('DELETE FROM products WHERE expires_at <= ?', (now,))
+            evicted = conn.execute(
+                """
+                DELETE FROM products WHERE (product, v1) IN (
+                    SELECT product, v1 FROM products ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        except sqlite3.Error:
+            logger.exception('Product cache write failed')
+            self._incr('errors')
+            return
+        self._incr('stores')
+        if evicted > 0:
+            with self._lock:
+                self.counters['evictions'] += evicted
+
+    def invalidate(self, product: str, v1: str, min_age: float = 0) -> bool:
+        """
+        Drop the entry for (product, v1) if it was stored at least min_age seconds ago.
+        Returns whether an entry was removed.
+        """
+        try:
+            removed = self._conn().execute(
+                'DELETE FROM products WHERE product = ? AND v1 = ? AND stored_at <= ?',
+                (product, v1, self.clock() - min_age),
+            ).rowcount
+        except sqlite3.Error:
+            logger.exception('Product cache invalidation failed')
+            self._incr('errors')
+            return False
+        if removed:
+            self._incr('invalidations')
+        return bool(removed)
+
+    def known_skus(self, product: str, v1: str) -> Optional[Set[int]]:
+        """Availability SKUs recorded for the live entry, or None if none were recorded yet."""
+        try:
+            row = self._conn().execute(
+                "SELECT json_extract(value, '$.skus') FROM products WHERE product = ? AND v1 = ? AND expires_at > ?",
+                (product, v1, self.clock()),
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception('Product cache read failed')
+            self._incr('errors')
+            return None
+        if row is None or row[0] is None:
+            return None
+        return set(json.loads(row[0]))
+
+    def remember_skus(self, product: str, v1: str, skus: Iterable[int]):
+        """Record the availability SKUs seen for the current entry (no-op if it is gone)."""
+        try:
+            self._conn().execute(
+                "UPDATE products SET value = json_set(value, '$.skus', json(?)) WHERE product = ? AND v1 = ?",
+                (json.dumps(sorted(skus)), product, v1),
+            )
+        except sqlite3.Error:
+            logger.exception('Product cache write failed')
+            self._incr('errors')
+
+    def stats(self) -> Dict:
+        """This process's hit/miss counters, plus the shared entry count."""
+        with self._lock:
+            snapshot = dict(self.counters)
+        lookups = snapshot.get('hits', 0) + snapshot.get('misses', 0)
+        try:
+            entries = self._conn().execute('SELECT COUNT(*) FROM products').fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {
+            **snapshot,
+            'hit_ratio': snapshot.get('hits', 0) / lookups if lookups else None,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+        }
+
+
+_default: Optional[ProductCache] = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ProductCache]:
+    """The process-wide cache configured from the environment, or None if disabled."""
+    global _default
+    if PRODUCT_CACHE_TTL_SECONDS <= 0:
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ProductCache(PRODUCT_CACHE_PATH, PRODUCT_CACHE_TTL_SECONDS, PRODUCT_CACHE_MAX_ENTRIES)
+    return _default
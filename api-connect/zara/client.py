@@ -0,0 +1,254 @@
+"""
+HTTP plumbing shared by the Zara scraper: per-stage timeouts, bounded retries
+with jittered backoff, optional hedging, and counters describing what happened.
+
+Everything is configured from environment variables (see ClientConfig) so the
+tracker and the API can be tuned without code changes.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Stages of a product lookup; each gets its own read timeout and counters.
+STAGES = ('page', 'verify', 'availability')
+
+# Statuses worth retrying: throttling and upstream/server failures.
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return float(value)
+
+
+class ClientConfig:
+    def __init__(
+        self,
+        connect_timeout: float = 3.05,
+        read_timeouts: Optional[Dict[str, float]] = None,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        retry_budget_ratio: float = 0.2,
+        retry_budget_capacity: int = 10,
+        hedge: bool = False,
+        hedge_after: Optional[float] = None,
+        hedge_min_samples: int = 20,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeouts = {'page': 10.0, 'verify': 5.0, 'availability': 3.0, **(read_timeouts or {})}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Every request earns `retry_budget_ratio` of a retry (banked up to
+        # `retry_budget_capacity`), so a struggling upstream sees at most ~20%
+        # extra traffic instead of a retry storm.
+        self.retry_budget_ratio = retry_budget_ratio
+        self.retry_budget_capacity = retry_budget_capacity
+        self.hedge = hedge
+        # Fixed hedge delay in seconds; when unset the observed p95 is used.
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+
+    @classmethod
+    def from_env(cls) -> 'ClientConfig':
+        return cls(
+            connect_timeout=_env_float('ZARA_CONNECT_TIMEOUT', 3.05),
+            read_timeouts={
+                stage: _env_float(f'ZARA_{stage.upper()}_READ_TIMEOUT', default)
+                for stage, default in (('page', 10.0), ('verify', 5.0), ('availability', 3.0))
+            },
+            max_retries=int(_env_float('ZARA_MAX_RETRIES', 2)),
+            backoff_base=_env_float('ZARA_BACKOFF_BASE', 0.2),
+            backoff_max=_env_float('ZARA_BACKOFF_MAX', 2.0),
+            retry_budget_ratio=_env_float('ZARA_RETRY_BUDGET_RATIO', 0.2),
+            retry_budget_capacity=int(_env_float('ZARA_RETRY_BUDGET_CAPACITY', 10)),
+            hedge=os.getenv('ZARA_HEDGE', '').lower() in ('1', 'true', 'yes'),
+            hedge_after=_env_float('ZARA_HEDGE_AFTER', None),
+        )
+
+    def timeout(self, stage: str):
+        return (self.connect_timeout, self.read_timeouts[stage])
+
+
+class LatencyWindow:
+    """Rolling window of recent successful request latencies for one stage."""
+
+    def __init__(self, size: int = 512):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class RetryBudget:
+    def __init__(self, ratio: float, capacity: int):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.capacity)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+config = ClientConfig.from_env()
+counters: Counter = Counter()
+latencies: Dict[str, LatencyWindow] = {stage: LatencyWindow() for stage in STAGES}
+_counters_lock = threading.Lock()
+_retry_budget = RetryBudget(config.retry_budget_ratio, config.retry_budget_capacity)
+
+
+def incr(name: str, amount: int = 1):
+    with _counters_lock:
+        counters[name] += amount
+
+
+def stats() -> Dict:
+    """Snapshot of counters and latency percentiles, for logging or a status endpoint."""
+    with _counters_lock:
+        snapshot = dict(counters)
+    return {
+        'counters': snapshot,
+        'latency': {
+            stage: {'p50': window.percentile(50), 'p95': window.percentile(95), 'p99': window.percentile(99)}
+            for stage, window in latencies.items()
+        },
+    }
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: uniform in [0, min(max, base * 2^attempt)].
+    return random.uniform(0, min(config.backoff_max, config.backoff_base * (2 ** attempt)))
+
+
+def request(session, method: str, url: str, stage: str, **kwargs) -> requests.Response:
+    """
+    Issue a request with the stage's timeouts, retrying connection errors,
+    timeouts and retryable statuses up to config.max_retries times while the
+    shared retry budget allows. The last response is returned as-is (callers
+    still call raise_for_status); the last exception is re-raised.
+    """
+    sender = session or requests
+    kwargs.setdefault('timeout', config.timeout(stage))
+    _retry_budget.deposit()
+    attempt = 0
+    while True:
+        incr(f'{stage}.requests')
+        started = time.monotonic()
+        try:
+            response = sender.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            incr(f'{stage}.timeouts' if isinstance(exc, requests.Timeout) else f'{stage}.connection_errors')
+            if attempt >= config.max_retries or not _retry_budget.withdraw():
+                incr(f'{stage}.failures')
+                raise
+            logger.info('Retrying %s %s after %s', method, url, type(exc).__name__)
+        else:
+            if response.status_code not in RETRYABLE_STATUSES:
+                latencies[stage].add(time.monotonic() - started)
+                return response
+            incr(f'{stage}.status_{response.status_code}')
+            if attempt >= config.max_retries or not _retry_budget.withdraw():
+                incr(f'{stage}.failures')
+                return response
+            logger.info('Retrying %s %s after HTTP %s', method, url, response.status_code)
+            # A discarded streamed response would hold its pooled connection until GC.
+            response.close()
+        incr(f'{stage}.retries')
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+
+def _start(fn, *args, **kwargs) -> Future:
+    """
+    Run fn on a thread of its own. A shared pool would make a request queue behind
+    other callers' requests, and that wait would count towards the p95 that
+    decides when to hedge. Threads are bounded by the callers (at most two each).
+    """
+    future: Future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, name='zara-hedge', daemon=True).start()
+    return future
+
+
+def _hedge_delay(stage: str) -> Optional[float]:
+    if config.hedge_after is not None:
+        return config.hedge_after
+    if len(latencies[stage]) < config.hedge_min_samples:
+        return None
+    return latencies[stage].percentile(95)
+
+
+def hedged_get(url: str, stage: str, **kwargs) -> requests.Response:
+    """
+    GET with request() and, when hedging is enabled, fire a second identical
+    request if the first has not answered within the hedge delay (the stage's
+    p95 by default). Whichever finishes first successfully wins; the loser is
+    left to finish in the background.
+    """
+    delay = _hedge_delay(stage) if config.hedge else None
+    if delay is None:
+        return request(None, 'GET', url, stage, **kwargs)
+
+    primary = _start(request, None, 'GET', url, stage, **kwargs)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    incr(f'{stage}.hedges')
+    hedge = _start(request, None, 'GET', url, stage, **kwargs)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except requests.RequestException as exc:
+                error = exc
+                continue
+            if future is hedge:
+                incr(f'{stage}.hedge_wins')
+            return response
+    raise error
@@ -0,0 +1,103 @@
+"""
+Selective decoding of the Zara viewPayload.
+
+The payload is a large JSON object (SEO, navigation, media, ...) of which
+get_product() needs three things: product.name, and productId plus sizes of
+product.detail.colors[0]. Instead of json.loads on the whole text, the scanner
+below walks only down those paths. Sibling values off the paths are skipped
+one at a time with the C decoder; each is decoded and dropped immediately, so
+the whole document is never held as Python objects at once.
+"""
+import json
+import re
+from typing import Any, Dict, List, Tuple, Union
+
+PathItem = Union[str, int]
+
+# Paths into the viewPayload that get_product() reads.
+PRODUCT_PATHS: Dict[str, Tuple[PathItem, ...]] = {
+    'name': ('product', 'name'),
+    'productId': ('product', 'detail', 'colors', 0, 'productId'),
+    'sizes': ('product', 'detail', 'colors', 0, 'sizes'),
+}
+
+_WS = re.compile(r'[ \t\n\r]*')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_decoder = json.JSONDecoder()
+
+
+class PayloadPathError(KeyError):
+    pass
+
+
+def _skip_ws(text: str, pos: int) -> int:
+    return _WS.match(text, pos).end()
+
+
+def _skip_value(text: str, pos: int) -> int:
+    """Return the index just past the JSON value starting at pos."""
+    if text[pos] == '"':
+        return _STRING.match(text, pos).end()
+    # The C decoder walks a skipped subtree far faster than any Python-level
+    # scanner; the objects it builds are dropped straight away, so only one
+    # sibling subtree is alive at a time rather than the whole document.
+    return _decoder.raw_decode(text, pos)[1]
+
+
+def _step(text: str, pos: int, step: PathItem) -> int:
+    """From the value at pos, return the start of its child `step`."""
+    if isinstance(step, int):
+        if text[pos] != '[':
+            raise PayloadPathError(step)
+        pos = _skip_ws(text, pos + 1)
+        for _ in range(step):
+            if text[pos] == ']':
+                raise PayloadPathError(step)
+            pos = _skip_ws(text, _skip_value(text, pos))
+            if text[pos] == ',':
+                pos = _skip_ws(text, pos + 1)
+        if text[pos] == ']':
+            raise PayloadPathError(step)
+        return pos
+
+    if text[pos] != '{':
+        raise PayloadPathError(step)
+    pos = _skip_ws(text, pos + 1)
+    # Match raw keys as written; escaped ones are decoded below.
+    target = json.dumps(step, ensure_ascii=False)
+    while text[pos] != '}':
+        key_end = _STRING.match(text, pos).end()
+        key = text[pos:key_end]
+        pos = _skip_ws(text, _skip_ws(text, key_end) + 1)  # past ':'
+        if key == target or ('\\' in key and json.loads(key) == step):
+            return pos
+        pos = _skip_ws(text, _skip_value(text, pos))
+        if text[pos] == ',':
+            pos = _skip_ws(text, pos + 1)
+    raise PayloadPathError(step)
+
+
+def extract(text: str, paths: Dict[str, Tuple[PathItem, ...]]) -> Dict[str, Any]:
+    """
+    Decode only the values at `paths` in the JSON document `text`.
+    Shared prefixes are walked once. Raises PayloadPathError if a path does not exist.
+    """
+    found = {(): _skip_ws(text, 0)}
+    result = {}
+    for name, path in paths.items():
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            if prefix not in found:
+                found[prefix] = _step(text, found[path[:depth - 1]], path[depth - 1])
+        result[name] = _decoder.raw_decode(text, found[path])[0]
+    return result
+
+
+def extract_product(text: str) -> Dict[str, Any]:
+    """name, plus productId and sizes of the first colour, as get_product() needs them."""
+    return extract(text, PRODUCT_PATHS)
+
+
+def sizes_by_sku(sizes: List[Dict[str, Any]]) -> Dict[int, str]:
+    # Normalize SKU keys as ints so they match availability payloads.
+    return {int(size['sku']): size['name'] for size in sizes}
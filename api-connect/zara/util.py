@@ -1,7 +1,38 @@
 import logging
+from typing import Iterable, Optional
 
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 
+VIEW_PAYLOAD_TOKEN = 'window.zara.viewPayload = '
+SCRIPT_END = '</script>'
+
+def extract_view_payload_script(chunks: Iterable[str]) -> Optional[str]:
+    """
+    Scan streamed page text for the viewPayload script and return it from the
+    `window.zara.viewPayload = ` token up to (not including) its `</script>`.
+    Stops consuming `chunks` as soon as the closing tag arrives; text before the
+    token is discarded as it streams past, so only the payload is held in memory.
+    """
+    parts = []
+    size = 0  # length of the text already in parts
+    tail = ''  # last few characters seen, so a marker split across chunks is still found
+    for chunk in chunks:
+        if not parts:
+            tail += chunk
+            start = tail.find(VIEW_PAYLOAD_TOKEN)
+            if start == -1:
+                tail = tail[-(len(VIEW_PAYLOAD_TOKEN) - 1):]
+                continue
+            chunk = tail[start:]
+            tail = ''
+        end = (tail + chunk).find(SCRIPT_END)
+        parts.append(chunk)
+        if end != -1:
+            return ''.join(parts)[:size - len(tail) + end]
+        size += len(chunk)
+        tail = (tail + chunk)[-(len(SCRIPT_END) - 1):]
+    return None
+
 def parse_zara_url(url: str):
     product_end = url.find('.html')
     product_begin = url.rfind('/', 0, product_end) + 1